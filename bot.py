@@ -7,24 +7,30 @@
 from __future__ import annotations
 
 import asyncio
+import atexit
+import functools
+import hashlib
 import logging
 import os
+import queue
+import re
 import shutil
 import sqlite3
-import subprocess
 import tempfile
-from collections import defaultdict
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import AsyncExitStack, contextmanager
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import Optional, Tuple
+from typing import Callable, Optional, Tuple
 from urllib.parse import urlparse
 
 from aiohttp import web
 from dotenv import load_dotenv
-from yt_dlp import YoutubeDL
-from yt_dlp.utils import DownloadError
-import openai
 
-from telegram import Update, constants
+from telegram import InputFile, Update, constants
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -45,10 +51,37 @@ chat_locks: defaultdict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
 # Utility functions
 # ---------------------------------------------------------------------------
 
+_MARKDOWN_V2_ESCAPES = str.maketrans({c: "\\" + c for c in r"\_*[]()~`>#+-=|{}.!"})
+
+
 def escape_markdown_v2(text: str) -> str:
     """Escape Telegram Markdown V2 special characters."""
-    chars = r"\_*[]()~`>#+-=|{}.!"
-    return "".join(f"\\{c}" if c in chars else c for c in text)
+    return text.translate(_MARKDOWN_V2_ESCAPES)
+
+
+# ASCII unit separator: not a Markdown V2 special character and never part of
+# recipe text, so it survives escaping and splits the batch back apart.
+_BATCH_SEP = "\x1f"
+
+
+def _escape_many(texts: list[str]) -> list[str]:
+    """Escape every string in ``texts`` with a single ``translate`` call."""
+    joined = _BATCH_SEP.join(texts)
+    if joined.count(_BATCH_SEP) != len(texts) - 1:
+        return [escape_markdown_v2(t) for t in texts]
+    return escape_markdown_v2(joined).split(_BATCH_SEP)
+
+
+# Section headings recognised by ``parse_recipe_blocks``.  All keywords are
+# matched case-insensitively in one pass at the start of the line; the group
+# name is the block the following lines belong to.
+_SECTION_RE = re.compile(
+    r"(?P<title>рецепт|название)"
+    r"|(?P<ingredients>ингредиенты)"
+    r"|(?P<steps>приготов|шаг)"
+    r"|(?P<extra>дополнительно|совет|примеч)",
+    re.IGNORECASE,
+)
 
 
 def parse_recipe_blocks(text: str) -> dict:
@@ -67,22 +100,16 @@ def parse_recipe_blocks(text: str) -> dict:
         stripped = line.strip()
         if not stripped:
             continue
-        l = stripped.lower()
-        if l.startswith("рецепт") or l.startswith("название"):
-            parts = stripped.split(":", 1)
-            if len(parts) > 1:
-                blocks["title"] = parts[1].strip()
+        heading = _SECTION_RE.match(stripped)
+        if heading:
+            if heading.lastgroup == "title":
+                parts = stripped.split(":", 1)
+                if len(parts) > 1:
+                    blocks["title"] = parts[1].strip()
+                else:
+                    blocks["title"] = stripped.partition(" ")[2].strip()
             else:
-                blocks["title"] = stripped.partition(" ")[2].strip()
-            continue
-        if l.startswith("ингредиенты"):
-            current = "ingredients"
-            continue
-        if l.startswith("приготов") or l.startswith("шаг"):
-            current = "steps"
-            continue
-        if l.startswith("дополнительно") or l.startswith("совет") or l.startswith("примеч"):
-            current = "extra"
+                current = heading.lastgroup
             continue
 
         if current == "ingredients":
@@ -166,33 +193,15 @@ def format_recipe_markdown(recipe: dict, original_url: str = "", duration: str =
     ingredients = recipe.get("ingredients") or []
     if ingredients:
         parts.append("🛒 *Ингредиенты*")
-        for item in ingredients:
-            raw = item.rstrip()
-            if not raw:
-                continue
-            if raw.endswith(":"):
-                head = raw[:-1].strip()
-                parts.append(f"🔸 *{escape_markdown_v2(head)}:*")
-                continue
-            indent = len(raw) - len(raw.lstrip())
-            text = raw.lstrip()
-            if text.startswith(("-", "•")):
-                text = text[1:].lstrip()
-            if "—" in text:
-                name, qty = text.split("—", 1)
-            elif "-" in text:
-                name, qty = text.split("-", 1)
-            else:
-                name, qty = text, "по вкусу"
-            name = name.strip() or "?"
-            qty = qty.strip() or "по вкусу"
-            parts.append(f"{' ' * indent}• {escape_markdown_v2(name)} — {escape_markdown_v2(qty)}")
+        parts.extend([_format_ingredient(raw) for item in ingredients if (raw := item.rstrip())])
         parts.append(sep)
         parts.append("")
 
     steps = recipe.get("steps") or []
     if steps:
         parts.append("👩‍🍳 *Шаги приготовления*")
+        prefixes: list[str] = []
+        texts: list[str] = []
         idx = 1
         for step in steps:
             raw = step.rstrip()
@@ -201,20 +210,21 @@ def format_recipe_markdown(recipe: dict, original_url: str = "", duration: str =
             indent = len(raw) - len(raw.lstrip())
             text = raw.lstrip()
             if text.startswith(("-", "•")) or indent > 0:
-                text = text.lstrip("-• ")
-                parts.append(f"{' ' * indent}• {escape_markdown_v2(text)}")
+                prefixes.append(f"{' ' * indent}• ")
+                texts.append(text.lstrip("-• "))
                 continue
-            text = text.lstrip("0123456789.- ")
-            parts.append(f"{idx}. {escape_markdown_v2(text)}")
+            prefixes.append(f"{idx}. ")
+            texts.append(text.lstrip("0123456789.- "))
             idx += 1
+        if texts:
+            parts.extend([p + t for p, t in zip(prefixes, _escape_many(texts))])
         parts.append(sep)
         parts.append("")
 
     extra = (recipe.get("extra") or "").strip()
     if extra:
         parts.append("💡 *Дополнительно*")
-        for line in extra.splitlines():
-            parts.append(escape_markdown_v2(line.strip()))
+        parts.extend([line.strip() for line in escape_markdown_v2(extra).splitlines()])
         parts.append(sep)
         parts.append("")
 
@@ -227,33 +237,156 @@ def format_recipe_markdown(recipe: dict, original_url: str = "", duration: str =
     while parts and parts[-1] == "":
         parts.pop()
 
+    return _assemble(parts)
+
+
+def _format_ingredient(raw: str) -> str:
+    """Format one non-empty ingredient line as ``• name — quantity`` or a sub-heading."""
+    if raw.endswith(":"):
+        return f"🔸 *{escape_markdown_v2(raw[:-1].strip())}:*"
+    indent = len(raw) - len(raw.lstrip())
+    text = raw.lstrip()
+    if text.startswith(("-", "•")):
+        text = text[1:].lstrip()
+    if "—" in text:
+        name, qty = text.split("—", 1)
+    elif "-" in text:
+        name, qty = text.split("-", 1)
+    else:
+        name, qty = text, "по вкусу"
+    name = name.strip() or "?"
+    qty = qty.strip() or "по вкусу"
+    return f"{' ' * indent}• {escape_markdown_v2(name)} — {escape_markdown_v2(qty)}"
+
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+
+def _assemble(parts: list[str], limit: int = TELEGRAM_MESSAGE_LIMIT) -> str:
+    """Join ``parts`` with newlines, dropping whole lines past ``limit`` characters.
+
+    Cutting at a line boundary keeps MarkdownV2 entities balanced, and lines
+    past the limit are never joined only to be sliced off again."""
+    total = -1
+    for i, part in enumerate(parts):
+        total += len(part) + 1
+        if total > limit:
+            return "\n".join(parts[:i])
     return "\n".join(parts)
 
 
+class _LRU:
+    """Small bounded mapping that forgets the least recently used entry."""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key):
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key, value) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def __iter__(self):
+        return iter(self._data)
+
+
 # ---------------------------------------------------------------------------
 # URL helpers
 # ---------------------------------------------------------------------------
 
+_INSTAGRAM_HOSTS = frozenset({"instagram.com", "www.instagram.com", "m.instagram.com"})
+_TIKTOK_HOSTS = frozenset(
+    {"tiktok.com", "www.tiktok.com", "m.tiktok.com", "vm.tiktok.com", "vt.tiktok.com"}
+)
+_YOUTUBE_HOSTS = frozenset({"youtube.com", "www.youtube.com", "m.youtube.com"})
+_YOUTU_BE_HOSTS = frozenset({"youtu.be", "www.youtu.be"})
+_INSTAGRAM_PATH_RE = re.compile(r"/(?:reel|p|tv)/")
+
+
 def is_supported_url(url: str) -> bool:
     """Return True if the url is from Instagram, TikTok or YouTube."""
     try:
         parsed = urlparse(url)
         if parsed.scheme not in {"http", "https"}:
             return False
-        host = parsed.netloc.lower()
-        path = parsed.path.lower()
-        if "instagram.com" in host:
-            return "/reel/" in path or "/p/" in path or "/tv/" in path
-        if "tiktok.com" in host or host in {"vm.tiktok.com", "vt.tiktok.com"}:
+        host = (parsed.hostname or "").lower()
+        if host in _TIKTOK_HOSTS or host in _YOUTU_BE_HOSTS:
             return True
-        if "youtube.com" in host or "youtu.be" in host:
-            return "/shorts/" in path or "v=" in parsed.query or "youtu.be" in host
+        if host in _INSTAGRAM_HOSTS:
+            return _INSTAGRAM_PATH_RE.search(parsed.path.lower()) is not None
+        if host in _YOUTUBE_HOSTS:
+            return "/shorts/" in parsed.path.lower() or "v=" in parsed.query
         return False
     except (ValueError, TypeError, AttributeError) as e:
         log.warning(f"Invalid URL format: {url}, error: {e}")
         return False
 
 
+_PLATFORM_HOSTS = (
+    ("instagram.com", "instagram"),
+    ("tiktok.com", "tiktok"),
+    ("youtube.com", "youtube"),
+    ("youtu.be", "youtube"),
+)
+
+
+_PLATFORM_BY_HOST = dict(_PLATFORM_HOSTS)
+# scheme://[userinfo@][subdomain.]<platform host>[:port] followed by the end
+# of the authority, so the platform is found in a single match.
+_PLATFORM_RE = re.compile(
+    r"^[a-z][a-z0-9+.-]*://(?:[^/?#@]*@)?(?:[^/?#@:]*\.)?("
+    + "|".join(re.escape(host) for host, _ in _PLATFORM_HOSTS)
+    + r")(?::\d*)?(?:[/?#]|$)",
+    re.IGNORECASE,
+)
+
+
+def detect_platform(url: str) -> Optional[str]:
+    """Return ``"instagram"``, ``"tiktok"`` or ``"youtube"`` for the url host.
+
+    Only the host name is inspected, so a platform name appearing in the
+    path or query string (``?ref=instagram.com``) is not a match."""
+    match = _PLATFORM_RE.match(url.strip())
+    return _PLATFORM_BY_HOST[match.group(1).lower()] if match else None
+
+
+_YT_VIDEO_ID_RE = re.compile(r"(?:^|&)v=([^&]+)")
+
+
+def canonical_url(url: str) -> str:
+    """Normalize a video link so shares of the same video compare equal.
+
+    Drops the scheme, ``www.``/``m.`` prefixes, trailing slashes, the
+    fragment and share-tracking query parameters (``igsh``, ``utm_*``,
+    ``si``...); only YouTube's ``v`` parameter identifies the video."""
+    try:
+        parts = urlparse(url.strip())
+    except ValueError:
+        return url
+    host = (parts.hostname or "").lower()
+    for prefix in ("www.", "m."):
+        if host.startswith(prefix):
+            host = host[len(prefix):]
+            break
+    query = ""
+    if detect_platform(url) == "youtube":
+        video_id = _YT_VIDEO_ID_RE.search(parts.query)
+        if video_id:
+            query = "?v=" + video_id.group(1)
+    return f"{host}{parts.path.rstrip('/')}{query}"
+
+
 # ---------------------------------------------------------------------------
 # Environment and database
 # ---------------------------------------------------------------------------
@@ -265,6 +398,68 @@ OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OWNER_ID = int(os.getenv("OWNER_ID", "0"))
 FREE_LIMIT = int(os.getenv("FREE_LIMIT", "6"))
 LOCK_TIMEOUT = int(os.getenv("LOCK_TIMEOUT", "300"))
+FFMPEG_CONCURRENCY = int(os.getenv("FFMPEG_CONCURRENCY", "2"))
+# Concurrent yt-dlp downloads; further requests wait in the pool's queue.
+# Downloads mostly wait on the network, so the default allows several per
+# core (a single-core instance would otherwise run them one at a time).
+DL_WORKERS = int(os.getenv("DL_WORKERS", str(min(16, (os.cpu_count() or 1) * 4))))
+# Concurrent downloads from any one platform; bursts above this are a common
+# trigger for rate limits and bot checks.
+DL_PER_PLATFORM = int(os.getenv("DL_PER_PLATFORM", "2"))
+# Download speed cap in bytes per second for everyone except the owner;
+# 0 disables it.  A slower download is better than a blocked server IP.
+YDL_RATELIMIT = int(os.getenv("YDL_RATELIMIT", "0"))
+# Parallel webhook deliveries Telegram may open (1-100, Telegram's default is 40).
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "100"))
+# Longest video (in seconds) the bot will download; 0 disables the check.
+MAX_DURATION = int(os.getenv("MAX_DURATION", "300"))
+# Largest source file (in bytes) the bot will download; 0 disables the check.
+MAX_FILESIZE = int(os.getenv("MAX_FILESIZE", str(50 * 1024 * 1024)))
+# Let ffmpeg read progressive MP4s straight from the CDN so transcoding
+# overlaps the download instead of waiting for it.
+STREAM_TRANSCODE = os.getenv("STREAM_TRANSCODE", "0") == "1"
+# Address of a self-hosted Bot API server (e.g. http://localhost:8081) that
+# shares this machine's filesystem; videos are then sent by path.
+TELEGRAM_API_BASE_URL = os.getenv("TELEGRAM_API_BASE_URL", "").rstrip("/")
+# "openai" uses the hosted whisper-1 endpoint, "local" runs faster-whisper.
+WHISPER_BACKEND = os.getenv("WHISPER_BACKEND", "openai").lower()
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "small")
+WHISPER_BATCH_SIZE = int(os.getenv("WHISPER_BATCH_SIZE", "8"))
+# Empty picks int8_float16 on a GPU and int8 on CPU.
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE", "")
+
+
+def _pick_tmp_dir() -> Optional[str]:
+    """Directory for downloads: ``TMP_DIR``, else /dev/shm if it has room.
+
+    A RAM-backed directory spares the disk a write and a read of every
+    video; ``None`` falls back to the system temp directory."""
+    configured = os.getenv("TMP_DIR")
+    if configured:
+        return configured
+    try:
+        if shutil.disk_usage("/dev/shm").free >= 512 * 1024 * 1024:
+            return "/dev/shm"
+    except OSError:
+        pass
+    return None
+
+
+TMP_DIR = _pick_tmp_dir()
+TMP_PREFIX = "recipe_bot_"
+
+
+def sweep_tmp_dir() -> None:
+    """Remove download directories and cookie files left behind by a previous run."""
+    for leftover in Path(TMP_DIR or tempfile.gettempdir()).glob(f"{TMP_PREFIX}*"):
+        if leftover.is_dir():
+            shutil.rmtree(leftover, ignore_errors=True)
+        else:
+            leftover.unlink(missing_ok=True)
+
+
+# Limits concurrent ffmpeg encodes so parallel requests don't thrash the CPU/GPU.
+ffmpeg_semaphore = asyncio.Semaphore(FFMPEG_CONCURRENCY)
 
 IG_COOKIES_CONTENT = os.getenv("IG_COOKIES_CONTENT", "")
 TT_COOKIES_CONTENT = os.getenv("TT_COOKIES_CONTENT", "")
@@ -285,43 +480,263 @@ TT_COOKIES_PATH = str(Path(TT_COOKIES_FILE).expanduser().resolve())
 YT_COOKIES_PATH = str(Path(YT_COOKIES_FILE).expanduser().resolve())
 
 
+# Cookie files only appear or change with a redeploy, so a file that has been
+# found once is not stat()ed again on every message.  Misses are not cached:
+# a file uploaded later is still picked up without a restart.
+_cookie_files_seen: set[str] = set()
+_cookie_files_readable: set[str] = set()
+
+
+def cookie_file_exists(path: str) -> bool:
+    if path in _cookie_files_seen:
+        return True
+    if os.path.exists(path):
+        _cookie_files_seen.add(path)
+        return True
+    return False
+
+
 def is_cookie_file_readable(path: str, name: str) -> bool:
     """Return True if the cookie file exists and can be read."""
+    if path in _cookie_files_readable:
+        return True
     try:
         with open(path, "rb"):
             pass
+        _cookie_files_readable.add(path)
         return True
     except Exception as exc:
         log.error(f"{name} cookies not found or invalid: {exc}")
         return False
 
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
 log = logging.getLogger(__name__)
 
 
+# Serializes writers so concurrent handlers don't contend for SQLite's file lock.
+db_write_lock = asyncio.Lock()
+
+
+def _connect() -> sqlite3.Connection:
+    """Open the quota database with per-connection tuning applied."""
+    db = sqlite3.connect("bot.db", isolation_level=None, check_same_thread=False)
+    # Wait for a competing writer instead of failing with "database is locked".
+    db.execute("PRAGMA busy_timeout=5000")
+    db.execute("PRAGMA synchronous=NORMAL")
+    db.execute("PRAGMA temp_store=MEMORY")
+    db.execute("PRAGMA cache_size=-20000")
+    db.execute("PRAGMA mmap_size=134217728")
+    # Checkpoints are run by the background flusher; the automatic one is
+    # only a backstop so it rarely lands in the middle of a request.
+    db.execute("PRAGMA wal_autocheckpoint=2000")
+    return db
+
+
+# One connection is opened by init_db() and shared by every query, so the
+# database and its WAL files are not reopened for each message.  sqlite3
+# connections must not run statements from several threads at once, hence
+# the lock around every use.
+_db: Optional[sqlite3.Connection] = None
+_db_lock = threading.Lock()
+
+
+def _get_db() -> sqlite3.Connection:
+    global _db
+    if _db is None:
+        _db = _connect()
+    return _db
+
+
+@contextmanager
+def _transaction():
+    """Run the body in a ``BEGIN IMMEDIATE`` transaction on the shared connection.
+
+    Taking the write lock up front avoids SQLITE_BUSY on lock upgrade."""
+    with _db_lock:
+        db = _get_db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+
+def close_db() -> None:
+    global _db
+    with _db_lock:
+        if _db is not None:
+            _db.close()
+            _db = None
+
+
 def init_db() -> None:
-    with sqlite3.connect("bot.db") as db:
+    close_db()
+    with _db_lock:
+        # WAL is persistent in the database file: readers no longer block
+        # on writers and commits avoid a full fsync of the rollback journal.
+        _get_db().execute("PRAGMA journal_mode=WAL")
+    with _transaction() as db:
         db.execute(
             """CREATE TABLE IF NOT EXISTS quota (uid INTEGER PRIMARY KEY, n INTEGER DEFAULT 0)"""
         )
-        db.commit()
+        db.execute(
+            """CREATE TABLE IF NOT EXISTS url_cache (
+                url_hash TEXT PRIMARY KEY, file_id TEXT, recipe_md TEXT, created_at INTEGER
+            )"""
+        )
+        db.execute(
+            """CREATE TABLE IF NOT EXISTS recipe_cache (
+                key TEXT PRIMARY KEY, recipe TEXT, created_at INTEGER
+            )"""
+        )
+    reset_quota_cache()
 
 
 def get_quota_usage(uid: int) -> int:
-    with sqlite3.connect("bot.db") as db:
-        cur = db.execute("SELECT n FROM quota WHERE uid=?", (uid,))
+    with _db_lock:
+        cur = _get_db().execute("SELECT n FROM quota WHERE uid=?", (uid,))
         row = cur.fetchone()
         return row[0] if row else 0
 
 
-def increment_quota(uid: int) -> int:
-    with sqlite3.connect("bot.db") as db:
-        cur = db.execute("SELECT n FROM quota WHERE uid=?", (uid,))
-        row = cur.fetchone()
-        n = (row[0] if row else 0) + 1
-        db.execute("INSERT OR REPLACE INTO quota(uid,n) VALUES(?,?)", (uid, n))
-        db.commit()
+def add_quota_usage(deltas: dict[int, int]) -> None:
+    """Add per-user usage ``deltas`` to the stored counters in one transaction."""
+    with _transaction() as db:
+        db.executemany(
+            "INSERT INTO quota(uid,n) VALUES(?,?) ON CONFLICT(uid) DO UPDATE SET n=quota.n+excluded.n",
+            deltas.items(),
+        )
+
+
+# Quota counters of recently active users live in a bounded LRU and are
+# written to SQLite in the background, so checking or bumping a quota rarely
+# touches the database.  A crash loses at most QUOTA_FLUSH_INTERVAL seconds of
+# increments.
+QUOTA_FLUSH_INTERVAL = 5
+QUOTA_CACHE_SIZE = 10_000
+_quota_mem = _LRU(maxsize=QUOTA_CACHE_SIZE)
+_quota_pending: dict[int, int] = {}
+
+
+def reset_quota_cache() -> None:
+    _quota_mem.clear()
+    _quota_pending.clear()
+
+
+async def get_quota_usage_async(uid: int) -> int:
+    n = _quota_mem.get(uid)
+    if n is not None:
         return n
+    # Holding the write lock keeps a concurrent flush from moving increments
+    # between _quota_pending and the table while they are added up.
+    async with db_write_lock:
+        n = await asyncio.to_thread(get_quota_usage, uid) + _quota_pending.get(uid, 0)
+    _quota_mem.put(uid, n)
+    return n
+
+
+async def increment_quota_async(uid: int) -> int:
+    n = await get_quota_usage_async(uid) + 1
+    _quota_mem.put(uid, n)
+    _quota_pending[uid] = _quota_pending.get(uid, 0) + 1
+    return n
+
+
+async def flush_quota() -> None:
+    """Write pending quota increments to SQLite."""
+    async with db_write_lock:
+        if not _quota_pending:
+            return
+        deltas = dict(_quota_pending)
+        _quota_pending.clear()
+        try:
+            await asyncio.to_thread(add_quota_usage, deltas)
+        except Exception as exc:
+            log.error(f"Quota flush failed: {exc}")
+            for uid, n in deltas.items():
+                _quota_pending[uid] = _quota_pending.get(uid, 0) + n
+
+
+def checkpoint_db() -> None:
+    """Copy committed WAL pages back into the database without blocking writers."""
+    with _db_lock:
+        _get_db().execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+
+async def _quota_flusher() -> None:
+    while True:
+        await asyncio.sleep(QUOTA_FLUSH_INTERVAL)
+        await flush_quota()
+        try:
+            await asyncio.to_thread(checkpoint_db)
+        except Exception as exc:
+            log.warning(f"WAL checkpoint failed: {exc}")
+
+
+# Processed videos are remembered by URL so a repeated link is answered with
+# the Telegram file_id and recipe instead of running the whole pipeline.
+URL_CACHE_TTL = 30 * 24 * 3600
+
+
+def _url_hash(url: str) -> str:
+    return hashlib.blake2b(canonical_url(url).encode(), digest_size=16).hexdigest()
+
+
+def get_cached_video(url: str) -> Optional[Tuple[str, str]]:
+    """Return ``(file_id, recipe_md)`` for a recently processed url."""
+    with _db_lock:
+        cur = _get_db().execute(
+            "SELECT file_id, recipe_md FROM url_cache WHERE url_hash=? AND created_at>=?",
+            (_url_hash(url), int(time.time()) - URL_CACHE_TTL),
+        )
+        row = cur.fetchone()
+        return (row[0], row[1]) if row else None
+
+
+def cache_video(url: str, file_id: str, recipe_md: str) -> None:
+    now = int(time.time())
+    with _transaction() as db:
+        db.execute(
+            "INSERT OR REPLACE INTO url_cache(url_hash,file_id,recipe_md,created_at) VALUES(?,?,?,?)",
+            (_url_hash(url), file_id, recipe_md, now),
+        )
+        db.execute("DELETE FROM url_cache WHERE created_at<?", (now - URL_CACHE_TTL,))
+
+
+async def get_cached_video_async(url: str) -> Optional[Tuple[str, str]]:
+    return await asyncio.to_thread(get_cached_video, url)
+
+
+async def cache_video_async(url: str, file_id: str, recipe_md: str) -> None:
+    async with db_write_lock:
+        await asyncio.to_thread(cache_video, url, file_id, recipe_md)
+
+
+# Model answers by input hash (see extract_recipe_from_video_text).
+RECIPE_CACHE_TTL = 30 * 24 * 3600
+
+
+def get_cached_recipe(key: str) -> Optional[str]:
+    with _db_lock:
+        cur = _get_db().execute(
+            "SELECT recipe FROM recipe_cache WHERE key=? AND created_at>=?",
+            (key, int(time.time()) - RECIPE_CACHE_TTL),
+        )
+        row = cur.fetchone()
+        return row[0] if row else None
+
+
+def cache_recipe(key: str, recipe: str) -> None:
+    now = int(time.time())
+    with _transaction() as db:
+        db.execute(
+            "INSERT OR REPLACE INTO recipe_cache(key,recipe,created_at) VALUES(?,?,?)",
+            (key, recipe, now),
+        )
+        db.execute("DELETE FROM recipe_cache WHERE created_at<?", (now - RECIPE_CACHE_TTL,))
 
 
 # ---------------------------------------------------------------------------
@@ -331,152 +746,648 @@ def increment_quota(uid: int) -> int:
 def create_temp_cookies_file(content: str) -> Optional[str]:
     if not content:
         return None
-    fd, path = tempfile.mkstemp(suffix=".txt")
+    # The bot's prefix lets sweep_tmp_dir() remove cookie files that outlive
+    # a killed process (atexit does not run on SIGKILL).
+    fd, path = tempfile.mkstemp(prefix=TMP_PREFIX, suffix=".txt", dir=TMP_DIR)
     with os.fdopen(fd, "w") as f:
         f.write(content)
     return path
 
 
-def get_ydl_opts(url: str) -> Tuple[dict, Optional[str]]:
-    headers = {"User-Agent": "Mozilla/5.0 (RecipeBot)"}
-    opts = {
-        "format": "best[height<=720]/best",
-        "quiet": True,
-        "no_warnings": True,
-        "http_headers": headers,
-    }
-    temp_cookie = None
-    if "instagram.com" in url:
-        if IG_COOKIES_CONTENT:
-            temp_cookie = create_temp_cookies_file(IG_COOKIES_CONTENT)
-        elif Path(IG_COOKIES_PATH).exists():
-            opts["cookiefile"] = IG_COOKIES_PATH
-    elif "tiktok.com" in url:
-        if TT_COOKIES_CONTENT:
-            temp_cookie = create_temp_cookies_file(TT_COOKIES_CONTENT)
-        elif Path(TT_COOKIES_PATH).exists():
-            opts["cookiefile"] = TT_COOKIES_PATH
-    elif "youtube.com" in url or "youtu.be" in url:
-        if YT_COOKIES_CONTENT:
-            temp_cookie = create_temp_cookies_file(YT_COOKIES_CONTENT)
-        elif Path(YT_COOKIES_PATH).exists():
-            opts["cookiefile"] = YT_COOKIES_PATH
-    if temp_cookie:
-        opts["cookiefile"] = temp_cookie
-    return opts, temp_cookie
-
-
-def _sync_download(url: str) -> Tuple[Optional[Path], Optional[dict], Optional[str]]:
-    temp_dir = Path(tempfile.mkdtemp())
-    temp_cookie = None
+# Options shared by every download; get_ydl_opts() only adds the cookie file.
+_BASE_YDL_OPTS = {
+    # Pre-muxed MP4s need no merge step and can be streamed straight into
+    # ffmpeg (STREAM_TRANSCODE); other containers are the fallback.
+    "format": "best[ext=mp4][height<=720]/best[height<=720]/best",
+    "quiet": True,
+    "no_warnings": True,
+    "http_headers": {"User-Agent": "Mozilla/5.0 (RecipeBot)"},
+    # Fetch HLS/DASH fragments in parallel instead of one at a time.
+    "concurrent_fragment_downloads": 8,
+    "fragment_retries": 3,
+    # Request plain HTTP downloads in 10 MB ranges; some CDNs (YouTube in
+    # particular) throttle long single-range responses.
+    "http_chunk_size": 10 * 1024 * 1024,
+}
+if MAX_FILESIZE:
+    # Backstop for extractors that report no size up front: yt-dlp aborts
+    # the transfer once the limit is reached.
+    _BASE_YDL_OPTS["max_filesize"] = MAX_FILESIZE
+
+
+def _platform_cookies(platform: Optional[str]) -> Tuple[str, str]:
+    """Return ``(cookie content, cookie file path)`` configured for ``platform``."""
+    if platform == "instagram":
+        return IG_COOKIES_CONTENT, IG_COOKIES_PATH
+    if platform == "tiktok":
+        return TT_COOKIES_CONTENT, TT_COOKIES_PATH
+    if platform == "youtube":
+        return YT_COOKIES_CONTENT, YT_COOKIES_PATH
+    return "", ""
+
+
+# Cookies supplied through *_COOKIES_CONTENT are written to a temporary file
+# once and reused by every download (and its cached YoutubeDL instance); the
+# files are removed when the process exits.
+_temp_cookie_files: dict[str, str] = {}
+_temp_cookie_lock = threading.Lock()
+
+
+def _cookie_file_for(content: str) -> Optional[str]:
+    with _temp_cookie_lock:
+        path = _temp_cookie_files.get(content)
+        if path is None or not os.path.exists(path):
+            path = create_temp_cookies_file(content)
+            if path:
+                _temp_cookie_files[content] = path
+        return path
+
+
+@atexit.register
+def _remove_temp_cookie_files() -> None:
+    for path in _temp_cookie_files.values():
+        Path(path).unlink(missing_ok=True)
+    _temp_cookie_files.clear()
+
+
+def get_ydl_opts(url: str) -> dict:
+    opts = dict(_BASE_YDL_OPTS)
+    content, cookie_path = _platform_cookies(detect_platform(url))
+    if content:
+        opts["cookiefile"] = _cookie_file_for(content)
+    elif cookie_path and cookie_file_exists(cookie_path):
+        opts["cookiefile"] = cookie_path
+    return opts
+
+
+# yt-dlp registers hundreds of extractors when imported, and openai pulls in
+# httpx and pydantic; both are loaded on first use to keep startup fast and
+# the idle process small.
+YoutubeDL = None
+DownloadError = None
+
+
+def _load_yt_dlp() -> None:
+    global YoutubeDL, DownloadError
+    if YoutubeDL is None:
+        from yt_dlp import YoutubeDL as ydl_class
+
+        YoutubeDL = ydl_class
+    if DownloadError is None:
+        from yt_dlp.utils import DownloadError as error_class
+
+        DownloadError = error_class
+
+
+# Downloads get their own bounded pool instead of asyncio's default executor,
+# which also serves DB access and DNS lookups.  Threads rather than processes
+# are used so the warm YoutubeDL instances below are shared and yt-dlp is
+# imported only once; extraction is mostly network-bound anyway.
+_download_pool = ThreadPoolExecutor(max_workers=DL_WORKERS, thread_name_prefix="download")
+
+# yt-dlp instances are reused between downloads so extractors, cookie jars
+# and HTTP connections stay warm.  YoutubeDL is not thread-safe, therefore
+# each download thread keeps its own instances keyed by cookie file.
+_ydl_cache = threading.local()
+
+
+def _get_ydl(opts: dict) -> YoutubeDL:
+    instances = getattr(_ydl_cache, "instances", None)
+    if instances is None:
+        instances = _ydl_cache.instances = {}
+    key = opts.get("cookiefile")
+    ydl = instances.get(key)
+    if ydl is None:
+        ydl = instances[key] = YoutubeDL(opts)
+    return ydl
+
+
+def _is_progressive_mp4(info: dict) -> bool:
+    """True if ``info`` points at a single plain-HTTP MP4 ffmpeg can read itself.
+
+    HLS/DASH and merged formats need yt-dlp's own downloaders."""
+    return (
+        bool(info.get("url"))
+        and info.get("protocol") in ("http", "https")
+        and info.get("ext") == "mp4"
+        and not info.get("requested_formats")
+    )
+
+
+def _sync_download(
+    url: str,
+    stream: bool = False,
+    on_info: Optional[Callable[[dict], None]] = None,
+    throttle: bool = True,
+) -> Tuple[Optional[Path], Optional[dict], Optional[str]]:
+    """Download ``url`` into a fresh temporary directory.
+
+    With ``stream`` a progressive MP4 is not downloaded: the path is ``None``
+    and ``info["http_headers"]`` carries everything (including cookies)
+    ``stream_video_to_720p`` needs to fetch ``info["url"]``.
+
+    ``on_info`` is called with the metadata once the video has passed the
+    duration and size checks, before any media is fetched.  ``throttle``
+    applies ``YDL_RATELIMIT`` to the transfer."""
+    _load_yt_dlp()
+    temp_dir = Path(tempfile.mkdtemp(prefix=TMP_PREFIX, dir=TMP_DIR))
     path: Optional[Path] = None
     info: Optional[dict] = None
     error: Optional[str] = None
     try:
-        opts, temp_cookie = get_ydl_opts(url)
-        opts["outtmpl"] = str(temp_dir / "%(id)s.%(ext)s")
-        with YoutubeDL(opts) as ydl:
-            info = ydl.extract_info(url, download=True)
+        opts = get_ydl_opts(url)
+        opts["outtmpl"] = "%(id)s.%(ext)s"
+        ydl = _get_ydl(opts)
+        ydl.params["paths"] = {"home": str(temp_dir)}
+        ydl.params["ratelimit"] = YDL_RATELIMIT if throttle and YDL_RATELIMIT else None
+        # Fetch metadata first so over-long or oversize videos are rejected
+        # before any media is downloaded; the extracted info is then reused
+        # for the download without a second extractor round-trip.
+        info = ydl.extract_info(url, download=False)
+        duration = (info or {}).get("duration") or 0
+        if MAX_DURATION and duration > MAX_DURATION:
+            error = f"Видео слишком длинное ({int(duration)} сек., максимум {MAX_DURATION} сек.)."
+            log.info(f"Rejected {url}: duration {duration}s exceeds {MAX_DURATION}s")
+            return None, None, error
+        size = (info or {}).get("filesize") or (info or {}).get("filesize_approx") or 0
+        if MAX_FILESIZE and size > MAX_FILESIZE:
+            mb = 1024 * 1024
+            error = f"Видео слишком большое ({size // mb} МБ, максимум {MAX_FILESIZE // mb} МБ)."
+            log.info(f"Rejected {url}: size {size} exceeds {MAX_FILESIZE}")
+            return None, None, error
+        if on_info is not None:
+            on_info(info)
+        # ffmpeg fetches a streamed video itself, outside yt-dlp's rate limit
+        # and max_filesize backstop, so only stream when neither is needed.
+        can_stream = not (throttle and YDL_RATELIMIT) and (not MAX_FILESIZE or size)
+        if stream and can_stream and _is_progressive_mp4(info):
+            headers = dict(info.get("http_headers") or {})
+            cookie = ydl.cookiejar.get_cookie_header(info["url"])
+            if cookie:
+                headers["Cookie"] = cookie
+            info["http_headers"] = headers
+            return None, info, None
+        info = ydl.process_ie_result(info, download=True)
+        # yt-dlp records the final file (after merging or remuxing) here, so
+        # the directory never has to be searched for it.
+        downloads = info.get("requested_downloads") or []
+        if downloads and downloads[0].get("filepath"):
+            path = Path(downloads[0]["filepath"])
+        else:
             path = Path(ydl.prepare_filename(info))
-            if not path.exists():
-                for f in temp_dir.iterdir():
-                    if f.is_file():
-                        path = f
-                        break
         return path, info, None
     except DownloadError as e:
         error = str(e)
         log.error(f"Download error: {error}")
         return None, None, error
     finally:
-        if temp_cookie:
-            Path(temp_cookie).unlink(missing_ok=True)
         if path is None or not path.exists():
             shutil.rmtree(temp_dir, ignore_errors=True)
 
 
-async def download_video(url: str) -> Tuple[Optional[Path], Optional[dict], Optional[str]]:
+# Limits concurrent media fetches per platform (see handle_url).  Waiters are
+# woken in FIFO order, so a platform's queue drains fairly.
+_platform_semaphores: defaultdict[Optional[str], asyncio.Semaphore] = defaultdict(
+    lambda: asyncio.Semaphore(DL_PER_PLATFORM)
+)
+
+
+async def download_video(
+    url: str,
+    stream: bool = False,
+    on_info: Optional[Callable[[dict], None]] = None,
+    throttle: bool = True,
+) -> Tuple[Optional[Path], Optional[dict], Optional[str]]:
+    """Run ``_sync_download`` in the download pool; ``on_info`` runs on the event loop."""
     loop = asyncio.get_running_loop()
-    return await loop.run_in_executor(None, _sync_download, url)
+    notify = None
+    if on_info is not None:
+        notify = functools.partial(loop.call_soon_threadsafe, on_info)
+    return await loop.run_in_executor(
+        _download_pool, _sync_download, url, stream, notify, throttle
+    )
+
 
+_nvenc_available: Optional[bool] = None
 
-def compress_video_to_720p(path: Path) -> Optional[str]:
+
+async def _has_nvenc() -> bool:
+    """Return True if the installed ffmpeg provides the ``h264_nvenc`` encoder.
+
+    The result is cached after the first probe."""
+    global _nvenc_available
+    if _nvenc_available is None:
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                "ffmpeg",
+                "-hide_banner",
+                "-encoders",
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.DEVNULL,
+            )
+            out, _ = await proc.communicate()
+            _nvenc_available = proc.returncode == 0 and b"h264_nvenc" in out
+        except OSError:
+            _nvenc_available = False
+    return _nvenc_available
+
+
+async def _run_ffmpeg(cmd: list[str]) -> tuple[bytes, Optional[str]]:
+    """Run ffmpeg without blocking the event loop.
+
+    Returns whatever ffmpeg wrote to stdout and ``None`` on success, or the
+    captured stderr as the error on failure."""
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+    )
+    out, err = await proc.communicate()
+    if proc.returncode == 0:
+        return out, None
+    return b"", err.decode(errors="replace").strip() or "ffmpeg execution failed"
+
+
+def _target_size(info: Optional[dict]) -> Optional[tuple[int, int]]:
+    """Output dimensions with the longer side at 720 and even sides, from probed info.
+
+    ffmpeg applies the display rotation before filtering, so a source rotated
+    by 90 or 270 degrees has its stored width and height swapped."""
+    w, h = (info or {}).get("width"), (info or {}).get("height")
+    if not w or not h:
+        return None
+    if (info.get("rotation") or 0) % 180 == 90:
+        w, h = h, w
+    if w >= h:
+        width, height = 720, round(h * 720 / w)
+        height -= height & 1
+    else:
+        width, height = round(w * 720 / h), 720
+        width -= width & 1
+    return max(width, 2), max(height, 2)
+
+
+_KEEP_ASPECT = "force_original_aspect_ratio=decrease:force_divisible_by=2"
+
+
+def _ffmpeg_720p_cmd(
+    src: Path | str,
+    dst: Path,
+    nvenc: bool,
+    audio: bool = False,
+    headers: Optional[dict] = None,
+    size: Optional[tuple[int, int]] = None,
+    maxrate: Optional[int] = None,
+) -> list[str]:
+    """Build the ffmpeg command scaling ``src`` to at most 720p.
+
+    ``src`` may be an HTTP URL, in which case ``headers`` are sent with the
+    request.  A known output ``size`` is passed as constant dimensions
+    instead of per-frame expressions; it is treated as a bounding box, so
+    wrong metadata cannot stretch the picture.  ``maxrate`` (kbit/s, normally the
+    source bitrate) caps the encoder.  When ``audio`` is set the same decode
+    also writes 16 kHz mono PCM16 suitable for Whisper to stdout, so the
+    input is not decoded a second time and no temporary audio file is
+    needed."""
+    if nvenc:
+        # Decode, scale and encode on the GPU so frames never leave video memory.
+        cmd = [
+            "ffmpeg",
+            "-y",
+            "-hwaccel",
+            "cuda",
+            "-hwaccel_output_format",
+            "cuda",
+            "-i",
+            str(src),
+            "-vf",
+            f"scale_npp={size[0]}:{size[1]}:{_KEEP_ASPECT}"
+            if size
+            else "scale_npp=720:720:force_original_aspect_ratio=decrease:force_divisible_by=2",
+            "-c:v",
+            "h264_nvenc",
+            "-preset",
+            "p4",
+            "-tune",
+            "ll",
+            "-rc",
+            "vbr",
+            "-cq",
+            "28",
+            "-b:v",
+            "0",
+            "-c:a",
+            "copy",
+            "-loglevel",
+            "error",
+            str(dst),
+        ]
+    else:
+        if size:
+            scale_expr = f"scale={size[0]}:{size[1]}:{_KEEP_ASPECT},setsar=1"
+        else:
+            scale_expr = "scale='if(gte(iw,ih),720,-2)':'if(gte(ih,iw),720,-2)'"
+        cmd = [
+            "ffmpeg",
+            "-y",
+            "-i",
+            str(src),
+            "-vf",
+            scale_expr,
+            "-c:v",
+            "libx264",
+            "-preset",
+            "fast",
+            "-crf",
+            "28",
+            "-c:a",
+            "copy",
+            "-loglevel",
+            "error",
+            str(dst),
+        ]
+    if maxrate:
+        at = cmd.index("-c:a")
+        cmd[at:at] = ["-maxrate", f"{maxrate}k", "-bufsize", f"{maxrate * 2}k"]
+    if audio:
+        # The local model takes raw samples straight into a NumPy array; the
+        # OpenAI endpoint needs a WAV container.
+        fmt = "s16le" if WHISPER_BACKEND == "local" else "wav"
+        cmd += ["-vn", "-ac", "1", "-ar", "16000", "-c:a", "pcm_s16le", "-f", fmt, "pipe:1"]
+    if headers:
+        cmd[2:2] = ["-headers", "".join(f"{k}: {v}\r\n" for k, v in headers.items())]
+    return cmd
+
+
+async def compress_video_to_720p(
+    path: Path, extract_audio: bool = False, info: Optional[dict] = None
+) -> tuple[bytes, Optional[str]]:
     """Compress and scale video to maximum 720p using ffmpeg.
 
-    Returns ``None`` on success or an error message on failure."""
+    NVENC is used when the ffmpeg build supports it, with a fallback to
+    ``libx264`` if the hardware encode fails (e.g. no GPU is attached).
+    At most ``FFMPEG_CONCURRENCY`` encodes run at the same time.  With
+    ``extract_audio`` the same ffmpeg run also returns the speech track as
+    in-memory audio for transcription (empty if there is no audio).  The
+    probed yt-dlp ``info`` fixes the output size and bitrate cap up front.
+
+    Returns the audio bytes and ``None`` on success or an error message on
+    failure."""
     out_path = path.with_name(path.stem + "_720p" + path.suffix)
-    scale_expr = "scale='if(gte(iw,ih),720,-2)':'if(gte(ih,iw),720,-2)'"
-    cmd = [
-        "ffmpeg",
-        "-y",
-        "-i",
-        str(path),
-        "-vf",
-        scale_expr,
-        "-c:v",
-        "libx264",
-        "-preset",
-        "fast",
-        "-crf",
-        "28",
-        "-c:a",
-        "copy",
-        "-loglevel",
-        "error",
-        str(out_path),
-    ]
+    wav, error = await _transcode_720p(path, out_path, extract_audio, info)
+    if error is not None:
+        return b"", error
+    path.unlink(missing_ok=True)
+    out_path.rename(path)
+    return wav, None
+
+
+async def stream_video_to_720p(
+    info: dict, extract_audio: bool = False
+) -> tuple[Optional[Path], bytes, Optional[str]]:
+    """Transcode ``info["url"]`` to 720p while ffmpeg is still fetching it.
+
+    ``info`` comes from ``download_video(url, stream=True)``.  The result is
+    written to a new temporary directory; returns its path, the audio bytes
+    (see ``compress_video_to_720p``) and ``None`` or an error message."""
+    temp_dir = Path(tempfile.mkdtemp(prefix=TMP_PREFIX, dir=TMP_DIR))
+    out_path = temp_dir / f"{info.get('id') or 'video'}.mp4"
+    wav, error = await _transcode_720p(
+        info["url"], out_path, extract_audio, info, headers=info.get("http_headers")
+    )
+    if error is not None:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        return None, b"", error
+    return out_path, wav, None
+
+
+async def _transcode_720p(
+    src: Path | str,
+    out_path: Path,
+    extract_audio: bool,
+    info: Optional[dict] = None,
+    headers: Optional[dict] = None,
+) -> tuple[bytes, Optional[str]]:
+    size = _target_size(info)
+    bitrate = (info or {}).get("vbr") or (info or {}).get("tbr")
+    maxrate = round(bitrate) if bitrate else None
+    attempts = [(False, extract_audio)]
+    if await _has_nvenc():
+        attempts.insert(0, (True, extract_audio))
+    if extract_audio:
+        # A video without an audio track makes the audio output fail; still
+        # deliver the video in that case.
+        attempts.append((False, False))
     try:
-        subprocess.run(cmd, check=True, capture_output=True, text=True)
-        path.unlink(missing_ok=True)
-        out_path.rename(path)
-        return None
-    except subprocess.CalledProcessError as exc:  # pragma: no cover - ffmpeg not invoked in tests
-        log.error(f"ffmpeg error: {exc.stderr}")
-        out_path.unlink(missing_ok=True)
-        return exc.stderr.strip() if exc.stderr else "ffmpeg execution failed"
+        async with ffmpeg_semaphore:
+            for nvenc, audio in attempts:
+                wav, error = await _run_ffmpeg(
+                    _ffmpeg_720p_cmd(src, out_path, nvenc, audio, headers, size, maxrate)
+                )
+                if error is None:
+                    break
+                log.warning(f"ffmpeg attempt failed (nvenc={nvenc}, audio={audio}), retrying: {error}")
+        if error is not None:  # pragma: no cover - ffmpeg not invoked in tests
+            log.error(f"ffmpeg error: {error}")
+            out_path.unlink(missing_ok=True)
+            return b"", error
+        return wav, None
     except Exception as exc:  # pragma: no cover - ffmpeg not invoked in tests
         log.error(f"ffmpeg error: {exc}")
         out_path.unlink(missing_ok=True)
-        return str(exc)
+        return b"", str(exc)
+
+
+# ---------------------------------------------------------------------------
+# Local Whisper helpers
+# ---------------------------------------------------------------------------
+
+def _whisper_model_kwargs() -> dict:
+    """Device and quantization settings for the local faster-whisper model."""
+    import ctranslate2
+
+    if ctranslate2.get_cuda_device_count() > 0:
+        return {"device": "cuda", "compute_type": WHISPER_COMPUTE_TYPE or "int8_float16"}
+    return {
+        "device": "cpu",
+        "compute_type": WHISPER_COMPUTE_TYPE or "int8",
+        "cpu_threads": os.cpu_count() or 0,
+    }
+
+
+class LocalTranscriber:
+    """Run transcriptions on a local faster-whisper model.
+
+    Jobs are queued and transcribed one at a time off the event loop, so
+    concurrent requests never load the model twice or compete for it.  Each
+    clip is split into segments that ``BatchedInferencePipeline`` decodes
+    ``batch_size`` at a time.
+    """
+
+    def __init__(self, batch_size: int = 8) -> None:
+        self.batch_size = batch_size
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._worker: Optional[asyncio.Task] = None
+        self._pipeline = None
+
+    async def submit(self, audio: bytes | Path) -> str:
+        """Queue ``audio`` and wait for its transcript."""
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((audio, future))
+        return await future
+
+    async def _run(self) -> None:
+        while True:
+            audio, future = await self._queue.get()
+            try:
+                text = await asyncio.to_thread(self._transcribe, audio)
+            except Exception as exc:
+                if not future.done():
+                    future.set_exception(exc)
+            else:
+                if not future.done():
+                    future.set_result(text)
+
+    def _load(self):
+        if self._pipeline is None:
+            from faster_whisper import BatchedInferencePipeline, WhisperModel
+
+            model = WhisperModel(WHISPER_MODEL, **_whisper_model_kwargs())
+            self._pipeline = BatchedInferencePipeline(model=model)
+        return self._pipeline
+
+    def _transcribe(self, audio: bytes | Path) -> str:
+        if isinstance(audio, Path):
+            source = str(audio)
+        else:
+            import numpy as np
+
+            # Raw PCM16 from ffmpeg is already 16 kHz mono, so it is handed
+            # over as float samples without another decode.
+            source = np.frombuffer(audio, dtype=np.int16).astype(np.float32) / 32768.0
+        segments, _ = self._load().transcribe(source, batch_size=self.batch_size)
+        return " ".join(seg.text.strip() for seg in segments)
+
+
+whisper_transcriber = LocalTranscriber(batch_size=WHISPER_BATCH_SIZE)
 
 
 # ---------------------------------------------------------------------------
 # OpenAI helpers
 # ---------------------------------------------------------------------------
 
-async def transcribe_video(path: Path) -> tuple[str, Optional[str]]:
-    """Return speech transcription for given video file and possible error."""
-    client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
+# One client for the whole process so its httpx connection pool (and the TLS
+# sessions in it) is reused across the Whisper and chat requests.
+_openai_client = None
+
+
+def _get_openai_client():
+    global _openai_client
+    if _openai_client is None:
+        import openai
+
+        # The SDK default waits up to 10 minutes per request; a stuck call
+        # should fail fast and be retried instead of holding the chat lock.
+        _openai_client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY, timeout=60, max_retries=2)
+    return _openai_client
+
+
+async def close_openai_client() -> None:
+    global _openai_client
+    if _openai_client is not None:
+        await _openai_client.close()
+        _openai_client = None
+
+
+async def transcribe_video(audio: bytes | Path) -> tuple[str, Optional[str]]:
+    """Return speech transcription for in-memory audio or a media file and possible error.
+
+    In-memory audio is a WAV for the OpenAI backend and raw PCM16 for the
+    local one (see ``_ffmpeg_720p_cmd``)."""
     try:
-        with open(path, "rb") as f:
-            resp = await client.audio.transcriptions.create(
-                model="whisper-1",
-                file=f,
-                response_format="text",
-            )
+        if WHISPER_BACKEND == "local":
+            return (await whisper_transcriber.submit(audio)).strip(), None
+        resp = await _get_openai_client().audio.transcriptions.create(
+            model="whisper-1",
+            file=("audio.wav", audio) if isinstance(audio, bytes) else audio,
+            response_format="text",
+        )
         return resp.strip(), None
     except Exception as exc:
         log.error(f"Transcription error: {exc}")
         return "", str(exc)
 
 
+# Short texts without any cooking vocabulary (usually a few hashtags) never
+# yield a recipe, so they are not sent to the model at all.
+_FOOD_RE = re.compile(
+    r"ингредиент|рецепт|приготов|готов|варит|жарит|запек|выпек|\bгр?\.|ст\.\s?л|ч\.\s?л"
+    r"|recipe|ingredient|cook|bake|fry|tbsp|tsp|cup",
+    re.IGNORECASE,
+)
+MIN_RECIPE_TEXT = 40
+
+RECIPE_MODEL = "gpt-3.5-turbo"
+# Bump whenever the prompt changes so stale cached answers are not reused.
+RECIPE_PROMPT_VERSION = "v1"
+
+
+def _recipe_key(text: str) -> str:
+    """Content address of a model answer.
+
+    Every part is length-prefixed so that different splits of the same
+    characters between fields cannot produce the same key."""
+    h = hashlib.sha256()
+    for part in (RECIPE_MODEL, RECIPE_PROMPT_VERSION, text):
+        data = part.encode()
+        h.update(f"{len(data)}:".encode())
+        h.update(data)
+    return h.hexdigest()
+
+
 async def extract_recipe_from_video_text(text: str) -> str:
-    """Extract a recipe from provided text using OpenAI."""
+    """Extract a recipe from provided text using OpenAI.
+
+    Answers are stored in SQLite by the hash of the model input, so the same
+    text (a video re-posted or shared by another user) is not sent twice."""
+    if len(text.strip()) < MIN_RECIPE_TEXT and not _FOOD_RE.search(text):
+        log.info("Skipping recipe extraction: text is too short and not about food")
+        return ""
+    key = _recipe_key(text)
+    try:
+        cached = await asyncio.to_thread(get_cached_recipe, key)
+    except sqlite3.Error as exc:
+        log.warning(f"Recipe cache lookup failed: {exc}")
+        cached = None
+    if cached is not None:
+        log.info("Recipe cache hit")
+        return cached
     prompt = (
         "Извлеки подробный кулинарный рецепт из описания видео. "
         "Верни заголовок, ингредиенты и шаги приготовления."
     )
-    client = openai.AsyncOpenAI(api_key=OPENAI_API_KEY)
     try:
-        response = await client.chat.completions.create(
-            model="gpt-3.5-turbo",
+        response = await _get_openai_client().chat.completions.create(
+            model=RECIPE_MODEL,
             messages=[{"role": "system", "content": prompt}, {"role": "user", "content": text}],
             max_tokens=700,
+            # A short answer; unlike uploads to Whisper it never needs the
+            # client-wide timeout.
+            timeout=15,
         )
-        return response.choices[0].message.content.strip()
+        recipe = response.choices[0].message.content.strip()
     except Exception as exc:
         log.error(f"OpenAI error: {exc}", exc_info=True)
         return ""
+    if recipe:
+        try:
+            async with db_write_lock:
+                await asyncio.to_thread(cache_recipe, key, recipe)
+        except sqlite3.Error as exc:
+            log.warning(f"Recipe cache write failed: {exc}")
+    return recipe
 
 
 # ---------------------------------------------------------------------------
@@ -496,7 +1407,7 @@ async def cmd_start(update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
 
 async def cmd_status(update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
     uid = update.effective_user.id
-    used = get_quota_usage(uid)
+    used = await get_quota_usage_async(uid)
     if uid == OWNER_ID:
         text = "👑 Вы владелец бота - лимитов нет"
     else:
@@ -504,9 +1415,43 @@ async def cmd_status(update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_text(text)
 
 
+# Model output by video, so the same video shared under a different link
+# (short link, another share URL) does not go through Whisper and GPT again.
+_recipe_cache = _LRU(maxsize=1024)
+
+
+def _video_key(info: dict) -> Optional[str]:
+    video_id = info.get("id")
+    if not video_id:
+        return None
+    return f"{info.get('extractor_key') or info.get('extractor') or ''}:{video_id}"
+
+
+async def send_video(update: Update, video_path: Path) -> Optional[str]:
+    """Reply with the video file, streaming it from disk.
+
+    Returns the Telegram ``file_id`` of the uploaded video."""
+    if TELEGRAM_API_BASE_URL:
+        # A local Bot API server reads the file straight from disk, so
+        # nothing is uploaded at all.
+        msg = await update.message.reply_video(video=video_path, supports_streaming=True)
+        return msg.video.file_id if msg and msg.video else None
+    # Hand the open file to the HTTP backend so it is streamed in chunks
+    # instead of being read into memory first.
+    with open(video_path, "rb") as f:
+        msg = await update.message.reply_video(
+            video=InputFile(f, filename=video_path.name, read_file_handle=False),
+            supports_streaming=True,
+        )
+    return msg.video.file_id if msg and msg.video else None
+
+
 async def handle_url(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
-    url = update.message.text.strip()
+    message = update.message
+    url = message.text.strip()
     uid = update.effective_user.id
+    is_owner = uid == OWNER_ID
+    reply_text = message.reply_text
 
     lock = chat_locks[uid]
     now = asyncio.get_event_loop().time()
@@ -522,11 +1467,11 @@ async def handle_url(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
         else:
             last = ctx.user_data.get("last_url")
             if last == url:
-                await update.message.reply_text(
+                await reply_text(
                     "⏳ Предыдущее видео еще обрабатывается, пожалуйста подождите"
                 )
             else:
-                await update.message.reply_text(
+                await reply_text(
                     "⏳ Подождите, идет обработка предыдущего видео"
                 )
             return
@@ -538,141 +1483,210 @@ async def handle_url(update: Update, ctx: ContextTypes.DEFAULT_TYPE) -> None:
         await asyncio.wait_for(lock.acquire(), timeout=5)
         acquired = True
     except asyncio.TimeoutError:
-        await update.message.reply_text(
+        await reply_text(
             "⚠️ Слишком много запросов. Попробуйте ещё раз позднее."
         )
         return
 
     ctx.user_data["processing_started"] = now
     video_path: Optional[Path] = None
+    recipe_task: Optional[asyncio.Task] = None
+    # At most DL_PER_PLATFORM media fetches per platform.  A streamed video is
+    # fetched by ffmpeg, so its slot is held until the transcode is done.
+    platform_slot = AsyncExitStack()
+
+    def start_recipe(probed: dict) -> None:
+        # The chat model only needs the title and description, so it works
+        # while the media is still being downloaded and transcoded.
+        nonlocal recipe_task
+        key = _video_key(probed)
+        title = (probed.get("title") or "").strip()
+        desc = (probed.get("description") or "").strip()
+        if (key and _recipe_cache.get(key)) or (not title and len(desc) < 20):
+            return
+        recipe_task = asyncio.create_task(extract_recipe_from_video_text(f"{title}\n{desc}"))
+
     try:
         if not is_supported_url(url):
-            await update.message.reply_text(
+            await reply_text(
                 "Неподдерживаемая ссылка. Пришлите Instagram Reels, TikTok или YouTube Shorts"
             )
             return
 
-        if uid != OWNER_ID and get_quota_usage(uid) >= FREE_LIMIT:
-            await update.message.reply_text("Бесплатный лимит исчерпан")
+        if not is_owner and await get_quota_usage_async(uid) >= FREE_LIMIT:
+            await reply_text("Бесплатный лимит исчерпан")
             return
 
-        if "instagram.com" in url:
-            if not IG_COOKIES_CONTENT and not Path(IG_COOKIES_PATH).exists():
+        cached = await get_cached_video_async(url)
+        if cached:
+            file_id, md = cached
+            log.info(f"Serving cached result for {uid}: {url}")
+            await message.reply_video(video=file_id, supports_streaming=True)
+            await reply_text(
+                md,
+                parse_mode=constants.ParseMode.MARKDOWN_V2,
+                disable_web_page_preview=True,
+            )
+            if not is_owner:
+                await increment_quota_async(uid)
+            return
+
+        platform = detect_platform(url)
+        if platform == "instagram":
+            if not IG_COOKIES_CONTENT and not cookie_file_exists(IG_COOKIES_PATH):
                 msg = "❌ Не удалось скачать видео. Не найден файл cookies для платформы Instagram."
                 log.error(msg)
-                await update.message.reply_text(msg)
+                await reply_text(msg)
                 return
             if not IG_COOKIES_CONTENT and not is_cookie_file_readable(IG_COOKIES_PATH, "Instagram"):
-                await update.message.reply_text(
+                await reply_text(
                     "❌ Не удалось скачать видео. Проверьте файл cookies для Instagram."
                 )
                 return
-        elif "tiktok.com" in url:
-            if not TT_COOKIES_CONTENT and not Path(TT_COOKIES_PATH).exists():
+        elif platform == "tiktok":
+            if not TT_COOKIES_CONTENT and not cookie_file_exists(TT_COOKIES_PATH):
                 msg = "❌ Не удалось скачать видео. Не найден файл cookies для платформы TikTok."
                 log.error(msg)
-                await update.message.reply_text(msg)
+                await reply_text(msg)
                 return
-        elif "youtube.com" in url or "youtu.be" in url:
-            if not YT_COOKIES_CONTENT and not Path(YT_COOKIES_PATH).exists():
+        elif platform == "youtube":
+            if not YT_COOKIES_CONTENT and not cookie_file_exists(YT_COOKIES_PATH):
                 msg = "❌ Не удалось скачать видео. Не найден файл cookies для платформы YouTube."
                 log.error(msg)
-                await update.message.reply_text(msg)
-                return
-
-            await update.message.reply_text("🏃 Скачиваю...")
-
-            try:
-                video_path, info, err = await download_video(url)
-            except Exception as exc:
-                log.error(f"Download exception: {exc}", exc_info=True)
-                video_path, info, err = None, None, str(exc)
-
-            if err:
-                emsg = err.lower()
-                if "private" in emsg:
-                    reason = "Видео приватное или требует входа в аккаунт."
-                elif "instagram.com" in url and (
-                    "login" in emsg or "sign in" in emsg or "forbidden" in emsg or "403" in emsg or "401" in emsg
-                ):
-                    reason = (
-                        "Проверьте, пожалуйста, актуальность cookies для Instagram и загрузите новый файл."
-                    )
-                    log.error(f"Instagram auth error: {err}")
-                elif "cookie" in emsg or "cookies" in emsg:
-                    reason = "Куки устарели или недействительны."
-                elif "403" in emsg or "forbidden" in emsg or "login" in emsg or "sign in" in emsg:
-                    reason = "Требуется вход в аккаунт."
-                else:
-                    reason = err
-                log.error(f"Processing error for {uid}: {reason}")
-                await update.message.reply_text(f"❌ Не удалось скачать видео. {reason}")
+                await reply_text(msg)
                 return
 
-            if not video_path or not info or not video_path.exists():
-                log.error(f"Processing error for {uid}: download failed")
-                await update.message.reply_text(
-                    "❌ Не удалось скачать видео. Возможные причины: приватное видео, требуется вход в аккаунт, видео было удалено или временные проблемы с платформой."
+        # Progress messages are sent while the work they announce is already
+        # running; they are awaited before the next reply to keep the order.
+        status = asyncio.create_task(reply_text("🏃 Скачиваю..."))
+        await platform_slot.enter_async_context(_platform_semaphores[platform])
+        try:
+            video_path, info, err = await download_video(
+                url, stream=STREAM_TRANSCODE, on_info=start_recipe, throttle=not is_owner
+            )
+        except Exception as exc:
+            log.error(f"Download exception: {exc}", exc_info=True)
+            video_path, info, err = None, None, str(exc)
+        if not (video_path is None and info is not None):
+            await platform_slot.aclose()
+        await status
+
+        if err:
+            emsg = err.lower()
+            if "private" in emsg:
+                reason = "Видео приватное или требует входа в аккаунт."
+            elif platform == "instagram" and (
+                "login" in emsg or "sign in" in emsg or "forbidden" in emsg or "403" in emsg or "401" in emsg
+            ):
+                reason = (
+                    "Проверьте, пожалуйста, актуальность cookies для Instagram и загрузите новый файл."
                 )
-                return
+                log.error(f"Instagram auth error: {err}")
+            elif "cookie" in emsg or "cookies" in emsg:
+                reason = "Куки устарели или недействительны."
+            elif "403" in emsg or "forbidden" in emsg or "login" in emsg or "sign in" in emsg:
+                reason = "Требуется вход в аккаунт."
+            else:
+                reason = err
+            log.error(f"Processing error for {uid}: {reason}")
+            await reply_text(f"❌ Не удалось скачать видео. {reason}")
+            return
 
-            ffmpeg_error = compress_video_to_720p(video_path)
-            if ffmpeg_error:
-                log.error(f"Processing error for {uid}: {ffmpeg_error}")
-                await update.message.reply_text(
-                    f"Не удалось обработать видео: {ffmpeg_error}"
-                )
-                shutil.rmtree(video_path.parent, ignore_errors=True)
-                return
+        streamed = video_path is None and info is not None
+        if not info or not (streamed or video_path.exists()):
+            log.error(f"Processing error for {uid}: download failed")
+            await reply_text(
+                "❌ Не удалось скачать видео. Возможные причины: приватное видео, требуется вход в аккаунт, видео было удалено или временные проблемы с платформой."
+            )
+            return
 
-            with open(video_path, "rb") as f:
-                await update.message.reply_video(video=f)
+        title = (info.get("title") or "").strip()
+        desc = (info.get("description") or "").strip()
+        video_key = _video_key(info)
+        recipe_text = _recipe_cache.get(video_key) if video_key else None
+        need_transcript = recipe_text is None and not title and len(desc) < 20
+        if streamed:
+            video_path, wav, ffmpeg_error = await stream_video_to_720p(
+                info, extract_audio=need_transcript
+            )
+            await platform_slot.aclose()
+        else:
+            wav, ffmpeg_error = await compress_video_to_720p(
+                video_path, extract_audio=need_transcript, info=info
+            )
+        if ffmpeg_error:
+            log.error(f"Processing error for {uid}: {ffmpeg_error}")
+            await reply_text(
+                f"Не удалось обработать видео: {ffmpeg_error}"
+            )
+            return
 
-            title = (info.get("title") or "").strip()
-            desc = (info.get("description") or "").strip()
-            need_transcript = not title and len(desc) < 20
+        # The upload does not depend on the recipe, so run it while Whisper
+        # and the chat model are working.
+        upload_task = asyncio.create_task(send_video(update, video_path))
+        try:
             transcript = ""
             t_err = None
             if need_transcript:
-                await update.message.reply_text("🤖 Распознаю речь...")
-                transcript, t_err = await transcribe_video(video_path)
+                status = asyncio.create_task(reply_text("🤖 Распознаю речь..."))
+                transcript, t_err = await transcribe_video(wav or video_path)
+                await status
                 if t_err and not transcript:
-                    await update.message.reply_text(
+                    await reply_text(
                         f"❌ Ошибка транскрипции: {t_err}"
                     )
                     log.error(f"Transcription failed for {uid}: {t_err}")
                     return
 
-            text_for_ai = transcript if transcript else f"{title}\n{desc}"
-            recipe_text = await extract_recipe_from_video_text(text_for_ai)
-            blocks = parse_recipe_blocks(recipe_text)
-            if not (blocks.get("title") or blocks.get("ingredients") or blocks.get("steps")):
-                if need_transcript and not transcript:
-                    await update.message.reply_text("❌ Не удалось распознать речь и извлечь рецепт из видео")
+            if recipe_text is None:
+                if recipe_task is not None:
+                    recipe_text = await recipe_task
                 else:
-                    await update.message.reply_text("Не удалось извлечь рецепт из видео")
+                    text_for_ai = transcript if transcript else f"{title}\n{desc}"
+                    recipe_text = await extract_recipe_from_video_text(text_for_ai)
+                if video_key and recipe_text:
+                    _recipe_cache.put(video_key, recipe_text)
             else:
-                md = format_recipe_markdown(
-                    blocks,
-                    original_url=info.get("webpage_url", url),
-                    duration=str(int(info.get("duration", 0))) + " сек." if info.get("duration") else "",
-                )
-                await update.message.reply_text(
-                    md,
-                    parse_mode=constants.ParseMode.MARKDOWN_V2,
-                    disable_web_page_preview=True,
-                )
+                log.info(f"Reusing recipe for {video_key}")
+        finally:
+            # The file must stay on disk until the upload has finished; this
+            # also keeps the video ahead of the recipe in the chat.
+            await upload_task
+
+        blocks = parse_recipe_blocks(recipe_text)
+        if not (blocks.get("title") or blocks.get("ingredients") or blocks.get("steps")):
+            if need_transcript and not transcript:
+                await reply_text("❌ Не удалось распознать речь и извлечь рецепт из видео")
+            else:
+                await reply_text("Не удалось извлечь рецепт из видео")
+        else:
+            md = format_recipe_markdown(
+                blocks,
+                original_url=info.get("webpage_url", url),
+                duration=str(int(info.get("duration", 0))) + " сек." if info.get("duration") else "",
+            )
+            await reply_text(
+                md,
+                parse_mode=constants.ParseMode.MARKDOWN_V2,
+                disable_web_page_preview=True,
+            )
+            file_id = upload_task.result()
+            if file_id:
+                await cache_video_async(url, file_id, md)
 
-            log.info(f"Finished processing for {uid}: {url}")
+        log.info(f"Finished processing for {uid}: {url}")
 
-            if uid != OWNER_ID:
-                increment_quota(uid)
+        if not is_owner:
+            await increment_quota_async(uid)
 
     finally:
+        if recipe_task is not None and not recipe_task.done():
+            recipe_task.cancel()
+        await platform_slot.aclose()
         if video_path:
-            tmpdir = video_path.parent
-            video_path.unlink(missing_ok=True)
-            shutil.rmtree(tmpdir, ignore_errors=True)
+            # Deleting a large file can stall on the filesystem; keep it off
+            # the event loop.
+            await asyncio.to_thread(shutil.rmtree, video_path.parent, ignore_errors=True)
         if acquired:
             lock.release()
         ctx.user_data.pop("last_url", None)
@@ -691,8 +1705,11 @@ def create_web_app(app: Application) -> web.Application:
     web_app.router.add_get("/", health_check)
 
     async def webhook_handler(request: web.Request) -> web.Response:
+        # Queue the update and answer at once: the application processes it
+        # concurrently (concurrent_updates), and Telegram would otherwise keep
+        # the delivery open for the whole download and redeliver on timeout.
         data = await request.json()
-        await app.process_update(Update.de_json(data, app.bot))
+        await app.update_queue.put(Update.de_json(data, app.bot))
         return web.Response(text="OK")
 
     web_app.router.add_post("/", webhook_handler)
@@ -703,6 +1720,19 @@ def create_web_app(app: Application) -> web.Application:
 # Main
 # ---------------------------------------------------------------------------
 
+def _start_log_listener() -> QueueListener:
+    """Move log output off the calling threads.
+
+    Records are only queued by the event loop and workers; the handlers set
+    up by ``basicConfig`` do the blocking writes in the listener's thread."""
+    root = logging.getLogger()
+    records: queue.SimpleQueue = queue.SimpleQueue()
+    listener = QueueListener(records, *root.handlers, respect_handler_level=True)
+    root.handlers = [QueueHandler(records)]
+    listener.start()
+    return listener
+
+
 async def main() -> None:
     if shutil.which("ffmpeg") is None:
         log.error("ffmpeg is required but was not found in PATH")
@@ -712,35 +1742,78 @@ async def main() -> None:
         return
 
     init_db()
-
-    app = Application.builder().token(TOKEN).build()
+    sweep_tmp_dir()
+
+    # Updates are handled concurrently so one chat's download does not hold
+    # up everyone else; chat_locks keeps each user's own requests in order.
+    builder = Application.builder().token(TOKEN).concurrent_updates(True)
+    if TELEGRAM_API_BASE_URL:
+        builder = (
+            builder.base_url(f"{TELEGRAM_API_BASE_URL}/bot")
+            .base_file_url(f"{TELEGRAM_API_BASE_URL}/file/bot")
+            .local_mode(True)
+        )
+    app = builder.build()
     app.add_handler(CommandHandler("start", cmd_start))
     app.add_handler(CommandHandler("status", cmd_status))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_url))
 
     web_app = create_web_app(app)
-    runner = web.AppRunner(web_app)
+    # Health probes hit "/" every few seconds; logging each one is pure overhead.
+    runner = web.AppRunner(web_app, access_log=None)
     await runner.setup()
     port = int(os.getenv("PORT", "8080"))
-    site = web.TCPSite(runner, "0.0.0.0", port)
+    # A deeper accept queue absorbs bursts of webhook deliveries.
+    site = web.TCPSite(runner, "0.0.0.0", port, backlog=256)
     await site.start()
 
     await app.initialize()
     webhook_url = os.getenv("WEBHOOK_URL")
     if webhook_url:
-        await app.bot.set_webhook(url=webhook_url)
+        # Only plain messages are handled, so Telegram need not deliver
+        # anything else.
+        await app.bot.set_webhook(
+            url=webhook_url,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
+            allowed_updates=["message"],
+        )
         await app.start()
     else:
         await app.start()
-        await app.updater.start_polling(drop_pending_updates=True)
+        # Long-poll for up to 50 s so an idle bot makes one getUpdates call
+        # per minute instead of one every few seconds.
+        await app.updater.start_polling(
+            timeout=50,
+            poll_interval=0,
+            allowed_updates=["message"],
+            drop_pending_updates=True,
+        )
 
+    quota_flusher = asyncio.create_task(_quota_flusher())
     try:
         await asyncio.Event().wait()
     finally:
         await app.stop()
         await app.shutdown()
+        quota_flusher.cancel()
+        await flush_quota()
+        await close_openai_client()
         await runner.cleanup()
+        _download_pool.shutdown(wait=False, cancel_futures=True)
+        close_db()
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    log_listener = _start_log_listener()
+    try:
+        # uvloop's libuv-based loop is a drop-in replacement with less
+        # overhead per await; it is not available on Windows.
+        try:
+            import uvloop
+        except ImportError:
+            asyncio.run(main())
+        else:
+            uvloop.run(main())
+    finally:
+        # Flushes records still in the queue.
+        log_listener.stop()
@@ -2,6 +2,7 @@ import sys
 import os
 import types
 import tempfile
+import threading
 from pathlib import Path
 
 # Ensure project root is on sys.path
@@ -24,6 +25,7 @@ sys.modules["yt_dlp"].YoutubeDL = object
 sys.modules["yt_dlp.utils"].DownloadError = Exception
 sys.modules["openai"].OpenAI = object
 sys.modules["telegram"].Update = object
+sys.modules["telegram"].InputFile = object
 sys.modules["telegram"].constants = types.SimpleNamespace(ParseMode=None)
 
 dotenv_mod = sys.modules.get("dotenv")
@@ -64,7 +66,7 @@ def test_sync_download_uses_temp_cookies(monkeypatch, tmp_path, var, url):
 
     monkeypatch.setattr(bot, "create_temp_cookies_file", fake_create_temp_cookies_file)
 
-    def fake_mkdtemp():
+    def fake_mkdtemp(**kwargs):
         d = tmp_path / "dl"
         d.mkdir(exist_ok=True)
         return str(d)
@@ -77,43 +79,106 @@ def test_sync_download_uses_temp_cookies(monkeypatch, tmp_path, var, url):
         def __init__(self, opts):
             last_opts.clear()
             last_opts.update(opts)
-            self.opts = opts
+            self.params = dict(opts)
 
-        def __enter__(self):
-            return self
-
-        def __exit__(self, exc_type, exc, tb):
-            return False
+        def close(self):
+            pass
 
         def extract_info(self, url, download=False):
             return {"id": "vid", "ext": "mp4"}
 
+        def process_ie_result(self, info, download=True):
+            return info
+
         def prepare_filename(self, info):
-            outtmpl = self.opts["outtmpl"]
-            path = outtmpl.replace("%(id)s", info["id"]).replace("%(ext)s", info["ext"])
-            Path(path).write_text("video")
-            return path
+            outtmpl = self.params["outtmpl"]
+            name = outtmpl.replace("%(id)s", info["id"]).replace("%(ext)s", info["ext"])
+            path = Path(self.params["paths"]["home"]) / name
+            path.write_text("video")
+            return str(path)
 
     monkeypatch.setattr(bot, "YoutubeDL", DummyDL)
+    monkeypatch.setattr(bot, "_ydl_cache", threading.local())
 
     # Reset cookie settings
     monkeypatch.setattr(bot, "IG_COOKIES_CONTENT", "" if var != "IG_COOKIES_CONTENT" else "cookie")
     monkeypatch.setattr(bot, "TT_COOKIES_CONTENT", "" if var != "TT_COOKIES_CONTENT" else "cookie")
     monkeypatch.setattr(bot, "YT_COOKIES_CONTENT", "" if var != "YT_COOKIES_CONTENT" else "cookie")
 
+    monkeypatch.setattr(bot, "_temp_cookie_files", {})
+
     path, info, err = bot._sync_download(url)
+    again, _, _ = bot._sync_download(url)
 
     assert err is None
     assert path is not None and info is not None
+    # the cookie file is written once and shared by later downloads
     assert len(cookie_paths) == 1
 
     cookie_path = Path(cookie_paths[0])
     assert last_opts.get("cookiefile") == cookie_paths[0]
-    # cookie file should be deleted in finally block
+    assert cookie_path.exists()
+    bot._remove_temp_cookie_files()
     assert not cookie_path.exists()
 
     # cleanup output file and directory
-    if path.exists():
+    for p in (path, again):
+        if p.exists():
+            p.unlink()
+        if p.parent.exists():
+            p.parent.rmdir()
+
+
+def test_sync_download_reuses_youtubedl_instance(monkeypatch, tmp_path):
+    created = []
+
+    class DummyDL:
+        def __init__(self, opts):
+            created.append(self)
+            self.params = dict(opts)
+
+        def extract_info(self, url, download=False):
+            return {"id": url.rsplit("/", 1)[-1], "ext": "mp4"}
+
+        def process_ie_result(self, info, download=True):
+            return info
+
+        def prepare_filename(self, info):
+            path = Path(self.params["paths"]["home"]) / f"{info['id']}.mp4"
+            path.write_text("video")
+            return str(path)
+
+    monkeypatch.setattr(bot, "YoutubeDL", DummyDL)
+    monkeypatch.setattr(bot, "_ydl_cache", threading.local())
+    for var in ("IG_COOKIES_CONTENT", "TT_COOKIES_CONTENT", "YT_COOKIES_CONTENT"):
+        monkeypatch.setattr(bot, var, "")
+
+    paths = [bot._sync_download(f"https://example.com/v{i}")[0] for i in range(2)]
+
+    assert len(created) == 1
+    assert paths[0].parent != paths[1].parent
+    for path in paths:
         path.unlink()
-    if path.parent.exists():
         path.parent.rmdir()
+
+
+def test_cookie_file_existence_is_cached(monkeypatch, tmp_path):
+    path = tmp_path / "cookies.txt"
+    monkeypatch.setattr(bot, "_cookie_files_seen", set())
+
+    assert not bot.cookie_file_exists(str(path))
+    path.write_text("# Netscape HTTP Cookie File\n")
+    assert bot.cookie_file_exists(str(path))
+
+    monkeypatch.setattr(bot.os.path, "exists", lambda p: False)
+    assert bot.cookie_file_exists(str(path))
+
+
+def test_temp_cookie_files_are_swept_on_startup(monkeypatch, tmp_path):
+    monkeypatch.setattr(bot, "TMP_DIR", str(tmp_path))
+    path = Path(bot.create_temp_cookies_file("# Netscape HTTP Cookie File\n"))
+    assert path.parent == tmp_path and path.name.startswith(bot.TMP_PREFIX)
+
+    bot.sweep_tmp_dir()
+
+    assert not path.exists()
@@ -23,6 +23,7 @@ sys.modules["yt_dlp"].YoutubeDL = object
 sys.modules["yt_dlp.utils"].DownloadError = Exception
 sys.modules["openai"].OpenAI = object
 sys.modules["telegram"].Update = object
+sys.modules["telegram"].InputFile = object
 sys.modules["telegram"].constants = types.SimpleNamespace(ParseMode=None)
 
 dotenv_mod = sys.modules.get("dotenv")
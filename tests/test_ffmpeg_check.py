@@ -24,6 +24,7 @@ sys.modules["yt_dlp"].YoutubeDL = object
 sys.modules["yt_dlp.utils"].DownloadError = Exception
 sys.modules["openai"].OpenAI = object
 sys.modules["telegram"].Update = object
+sys.modules["telegram"].InputFile = object
 sys.modules["telegram"].constants = types.SimpleNamespace(ParseMode=None)
 
 dotenv_mod = sys.modules.get("dotenv")
@@ -52,3 +53,57 @@ def test_main_logs_error_when_ffmpeg_missing(monkeypatch, caplog):
     with caplog.at_level(logging.ERROR, logger=bot.log.name):
         asyncio.run(bot.main())
     assert any("ffmpeg is required" in r.message for r in caplog.records)
+
+
+def test_ffmpeg_cmd_uses_nvenc_when_available(tmp_path):
+    src, dst = tmp_path / "in.mp4", tmp_path / "out.mp4"
+    gpu = bot._ffmpeg_720p_cmd(src, dst, nvenc=True)
+    cpu = bot._ffmpeg_720p_cmd(src, dst, nvenc=False)
+    assert "h264_nvenc" in gpu and "libx264" not in gpu
+    assert "libx264" in cpu and "-hwaccel" not in cpu
+    assert gpu[-1] == cpu[-1] == str(dst)
+
+
+def test_ffmpeg_cmd_writes_audio_in_same_pass(tmp_path):
+    src, dst = tmp_path / "in.mp4", tmp_path / "out.mp4"
+    cmd = bot._ffmpeg_720p_cmd(src, dst, nvenc=False, audio=True)
+    assert cmd.count("-i") == 1
+    assert cmd[-1] == "pipe:1"
+    assert cmd.index(str(dst)) < cmd.index("pcm_s16le")
+
+
+def test_ffmpeg_cmd_writes_raw_pcm_for_local_whisper(tmp_path, monkeypatch):
+    src, dst = tmp_path / "in.mp4", tmp_path / "out.mp4"
+    monkeypatch.setattr(bot, "WHISPER_BACKEND", "local")
+    cmd = bot._ffmpeg_720p_cmd(src, dst, nvenc=False, audio=True)
+    assert cmd[cmd.index("-f", cmd.index(str(dst))) + 1] == "s16le"
+
+
+def test_ffmpeg_cmd_reads_url_with_headers(tmp_path):
+    dst = tmp_path / "out.mp4"
+    url = "https://cdn.example.com/v.mp4"
+    cmd = bot._ffmpeg_720p_cmd(url, dst, nvenc=True, headers={"Cookie": "a=1"})
+    assert cmd[cmd.index("-headers") + 1] == "Cookie: a=1\r\n"
+    assert cmd.index("-headers") < cmd.index("-i") and cmd[cmd.index("-i") + 1] == url
+
+
+def test_target_size_is_even_with_long_side_720():
+    assert bot._target_size({"width": 1080, "height": 1920}) == (404, 720)
+    assert bot._target_size({"width": 1920, "height": 1080}) == (720, 404)
+    assert bot._target_size({"width": None, "height": 1080}) is None
+
+
+def test_target_size_swaps_sides_of_rotated_source():
+    info = {"width": 1920, "height": 1080, "rotation": 90}
+    assert bot._target_size(info) == (404, 720)
+    assert bot._target_size({**info, "rotation": 180}) == (720, 404)
+
+
+def test_ffmpeg_cmd_uses_fixed_size_and_maxrate(tmp_path):
+    src, dst = tmp_path / "in.mp4", tmp_path / "out.mp4"
+    cpu = bot._ffmpeg_720p_cmd(src, dst, nvenc=False, size=(404, 720), maxrate=1500)
+    gpu = bot._ffmpeg_720p_cmd(src, dst, nvenc=True, size=(404, 720), maxrate=1500)
+    keep = "force_original_aspect_ratio=decrease:force_divisible_by=2"
+    assert cpu[cpu.index("-vf") + 1] == f"scale=404:720:{keep},setsar=1"
+    assert gpu[gpu.index("-vf") + 1] == f"scale_npp=404:720:{keep}"
+    assert gpu[gpu.index("-maxrate") + 1] == "1500k" and "3000k" in gpu
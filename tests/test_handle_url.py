@@ -0,0 +1,156 @@
+import sys
+import os
+import types
+import tempfile
+import threading
+from pathlib import Path
+
+# Ensure project root is on sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+# Stub external dependencies used in bot.py so that it can be imported
+for name in [
+    "aiohttp", "aiohttp.web",
+    "dotenv", "dotenv.main",
+    "yt_dlp", "yt_dlp.utils",
+    "openai",
+    "telegram", "telegram.ext",
+]:
+    if name not in sys.modules:
+        sys.modules[name] = types.ModuleType(name)
+
+# Provide minimal stubs for submodules/classes used during import
+sys.modules["aiohttp.web"].Application = object
+sys.modules["yt_dlp"].YoutubeDL = object
+sys.modules["yt_dlp.utils"].DownloadError = Exception
+sys.modules["openai"].OpenAI = object
+sys.modules["telegram"].Update = object
+sys.modules["telegram"].InputFile = object
+sys.modules["telegram"].constants = types.SimpleNamespace(ParseMode=None)
+
+dotenv_mod = sys.modules.get("dotenv")
+setattr(dotenv_mod, "load_dotenv", lambda *args, **kwargs: None)
+
+telegram_ext = sys.modules.get("telegram.ext")
+setattr(telegram_ext, "Application", object)
+setattr(telegram_ext, "ContextTypes", object)
+setattr(telegram_ext, "CommandHandler", object)
+setattr(telegram_ext, "MessageHandler", object)
+setattr(telegram_ext, "filters", object)
+
+# Set required environment variables for importing bot
+os.environ.setdefault("TELEGRAM_TOKEN", "test")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import bot
+import asyncio
+import pytest
+
+
+def make_update(url, uid=1):
+    replies = []
+
+    async def reply_text(text, **kwargs):
+        replies.append(text)
+
+    async def reply_video(video, **kwargs):
+        replies.append(video)
+        return types.SimpleNamespace(video=types.SimpleNamespace(file_id="fid"))
+
+    message = types.SimpleNamespace(text=url, reply_text=reply_text, reply_video=reply_video)
+    update = types.SimpleNamespace(message=message, effective_user=types.SimpleNamespace(id=uid))
+    return update, types.SimpleNamespace(user_data={}), replies
+
+
+@pytest.fixture
+def pipeline(monkeypatch):
+    """Stub out everything around handle_url that talks to the outside world."""
+
+    async def no_usage(uid):
+        return 0
+
+    async def no_cache(url):
+        return None
+
+    monkeypatch.setattr(bot, "get_quota_usage_async", no_usage)
+    monkeypatch.setattr(bot, "increment_quota_async", no_usage)
+    monkeypatch.setattr(bot, "get_cached_video_async", no_cache)
+    monkeypatch.setattr(bot, "YT_COOKIES_CONTENT", "cookie")
+    monkeypatch.setattr(bot, "chat_locks", bot.defaultdict(asyncio.Lock))
+
+
+def test_handle_url_reports_failed_stream_transcode(monkeypatch, pipeline):
+    async def fake_download(url, stream=False, on_info=None, throttle=True):
+        return None, {"id": "vid", "url": "https://cdn.example.com/v.mp4"}, None
+
+    async def fake_stream(info, extract_audio=False):
+        return None, b"", "boom"
+
+    monkeypatch.setattr(bot, "download_video", fake_download)
+    monkeypatch.setattr(bot, "stream_video_to_720p", fake_stream)
+    update, ctx, replies = make_update("https://youtu.be/abc")
+
+    asyncio.run(bot.handle_url(update, ctx))
+
+    assert replies[-1] == "Не удалось обработать видео: boom"
+    assert ctx.user_data == {}
+    assert not bot.chat_locks[1].locked()
+
+
+@pytest.mark.parametrize("uid,throttle", [(1, True), (42, False)])
+def test_handle_url_skips_download_throttle_for_owner(monkeypatch, pipeline, uid, throttle):
+    monkeypatch.setattr(bot, "OWNER_ID", 42)
+    calls = []
+
+    async def fake_download(url, stream=False, on_info=None, throttle=True):
+        calls.append(throttle)
+        return None, None, "stop"
+
+    monkeypatch.setattr(bot, "download_video", fake_download)
+    update, ctx, replies = make_update("https://youtu.be/abc", uid=uid)
+
+    asyncio.run(bot.handle_url(update, ctx))
+
+    assert calls == [throttle]
+    assert replies[-1] == "❌ Не удалось скачать видео. stop"
+
+
+def test_streamed_job_keeps_platform_slot_until_transcoded(monkeypatch, pipeline):
+    import collections
+
+    monkeypatch.setattr(bot, "DL_PER_PLATFORM", 1)
+    monkeypatch.setattr(
+        bot, "_platform_semaphores",
+        collections.defaultdict(lambda: asyncio.Semaphore(bot.DL_PER_PLATFORM)),
+    )
+    events = []
+
+    async def fake_download(url, stream=False, on_info=None, throttle=True):
+        events.append(("download", url))
+        await asyncio.sleep(0)
+        return None, {"id": url, "url": "https://cdn.example.com/v.mp4"}, None
+
+    async def fake_stream(info, extract_audio=False):
+        events.append(("stream start", info["id"]))
+        await asyncio.sleep(0.01)
+        events.append(("stream end", info["id"]))
+        return None, b"", "stop"
+
+    monkeypatch.setattr(bot, "download_video", fake_download)
+    monkeypatch.setattr(bot, "stream_video_to_720p", fake_stream)
+    first = make_update("https://youtu.be/a", uid=1)
+    second = make_update("https://youtu.be/b", uid=2)
+
+    async def scenario():
+        await asyncio.gather(bot.handle_url(*first[:2]), bot.handle_url(*second[:2]))
+
+    asyncio.run(scenario())
+    assert events == [
+        ("download", "https://youtu.be/a"),
+        ("stream start", "https://youtu.be/a"),
+        ("stream end", "https://youtu.be/a"),
+        ("download", "https://youtu.be/b"),
+        ("stream start", "https://youtu.be/b"),
+        ("stream end", "https://youtu.be/b"),
+    ]
+    assert not bot._platform_semaphores["youtube"].locked()
@@ -22,6 +22,7 @@ sys.modules["yt_dlp"].YoutubeDL = object
 sys.modules["yt_dlp.utils"].DownloadError = Exception
 sys.modules["openai"].OpenAI = object
 sys.modules["telegram"].Update = object
+sys.modules["telegram"].InputFile = object
 sys.modules["telegram"].constants = types.SimpleNamespace(ParseMode=None)
 # Provide minimal attribute for load_dotenv in dotenv
 dotenv_mod = sys.modules.get("dotenv")
@@ -139,3 +140,74 @@ def test_is_supported_url_propagates_unexpected(monkeypatch):
         is_supported_url("bad")
 
 
+def test_detect_platform_checks_host_only():
+    assert bot.detect_platform("https://www.instagram.com/reel/abc/") == "instagram"
+    assert bot.detect_platform("https://vm.tiktok.com/ZGJ/") == "tiktok"
+    assert bot.detect_platform("https://youtu.be/abc") == "youtube"
+    assert bot.detect_platform("https://example.com/?ref=instagram.com") is None
+    assert bot.detect_platform("https://notyoutube.com/watch?v=1") is None
+
+
+def test_format_recipe_markdown_fits_telegram_limit():
+    recipe = {"title": "Суп", "ingredients": [], "steps": [f"Шаг {'x' * 90}" for _ in range(100)], "extra": ""}
+    md = bot.format_recipe_markdown(recipe)
+    assert len(md) <= bot.TELEGRAM_MESSAGE_LIMIT
+    assert md.endswith("x")
+
+
+def test_assemble_keeps_exact_fit():
+    assert bot._assemble(["ab", "cd"], limit=5) == "ab\ncd"
+    assert bot._assemble(["ab", "cd"], limit=4) == "ab"
+
+
+def test_canonical_url_ignores_share_tracking():
+    base = bot.canonical_url("https://www.instagram.com/reel/ABC/")
+    assert base == "instagram.com/reel/ABC"
+    assert bot.canonical_url("https://instagram.com/reel/ABC?igsh=xyz&utm_source=ig") == base
+    assert bot.canonical_url("https://m.youtube.com/watch?si=1&v=abc#t=3") == "youtube.com/watch?v=abc"
+    assert bot.canonical_url("https://youtu.be/abc?si=1") == "youtu.be/abc"
+
+
+def test_detect_platform_handles_case_port_and_userinfo():
+    assert bot.detect_platform("HTTPS://WWW.TikTok.com/@u/video/1") == "tiktok"
+    assert bot.detect_platform("https://m.youtube.com:443/shorts/a") == "youtube"
+    assert bot.detect_platform("https://instagram.com@evil.com/reel/a") is None
+    assert bot.detect_platform("https://youtu.be.evil.com/a") is None
+
+
+def test_escape_markdown_v2_escapes_every_special_char():
+    specials = "\\_*[]()~`>#+-=|{}.!"
+    assert escape_markdown_v2(specials + "ok") == "".join("\\" + c for c in specials) + "ok"
+
+
+def test_is_supported_url_matches_exact_hosts():
+    assert is_supported_url("https://m.youtube.com/shorts/abc")
+    assert is_supported_url("https://www.instagram.com/chef/reel/abc/")
+    assert not is_supported_url("https://instagram.com.evil.com/reel/abc/")
+    assert not is_supported_url("https://notyoutube.com/watch?v=1")
+
+
+def test_recipe_lru_evicts_least_recently_used():
+    cache = bot._LRU(maxsize=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == ("1", "3")
+    assert bot._video_key({"id": "42", "extractor_key": "TikTok"}) == "TikTok:42"
+    assert bot._video_key({}) is None
+
+
+def test_parse_recipe_blocks_headings_ignore_case():
+    text = "РЕЦЕПТ: Суп\nИНГРЕДИЕНТЫ:\n- вода\nПРИГОТОВЛЕНИЕ:\n1. Вскипятить воду"
+    blocks = parse_recipe_blocks(text)
+    assert blocks["title"] == "Суп"
+    assert blocks["ingredients"] == ["вода"]
+    assert blocks["steps"] == ["Вскипятить воду"]
+
+
+def test_escape_many_matches_single_escapes():
+    texts = ["1.5 ст. л.", "", "a_b (c)", "x\x1fy"]
+    assert bot._escape_many(texts[:3]) == [escape_markdown_v2(t) for t in texts[:3]]
+    assert bot._escape_many(texts) == [escape_markdown_v2(t) for t in texts]
@@ -0,0 +1,154 @@
+import sys
+import os
+import types
+import tempfile
+from pathlib import Path
+
+# Ensure project root is on sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+# Stub external dependencies used in bot.py so that it can be imported
+for name in [
+    "aiohttp", "aiohttp.web",
+    "dotenv", "dotenv.main",
+    "yt_dlp", "yt_dlp.utils",
+    "openai",
+    "telegram", "telegram.ext",
+]:
+    if name not in sys.modules:
+        sys.modules[name] = types.ModuleType(name)
+
+# Provide minimal stubs for submodules/classes used during import
+sys.modules["aiohttp.web"].Application = object
+sys.modules["yt_dlp"].YoutubeDL = object
+sys.modules["yt_dlp.utils"].DownloadError = Exception
+sys.modules["openai"].OpenAI = object
+sys.modules["telegram"].Update = object
+sys.modules["telegram"].InputFile = object
+sys.modules["telegram"].constants = types.SimpleNamespace(ParseMode=None)
+
+dotenv_mod = sys.modules.get("dotenv")
+setattr(dotenv_mod, "load_dotenv", lambda *args, **kwargs: None)
+
+telegram_ext = sys.modules.get("telegram.ext")
+setattr(telegram_ext, "Application", object)
+setattr(telegram_ext, "ContextTypes", object)
+setattr(telegram_ext, "CommandHandler", object)
+setattr(telegram_ext, "MessageHandler", object)
+setattr(telegram_ext, "filters", object)
+
+# Set required environment variables for importing bot
+os.environ.setdefault("TELEGRAM_TOKEN", "test")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import bot
+import asyncio
+import sqlite3
+
+
+def test_quota_roundtrip_uses_wal(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    bot.init_db()
+
+    async def scenario():
+        assert await bot.get_quota_usage_async(1) == 0
+        await asyncio.gather(*(bot.increment_quota_async(1) for _ in range(3)))
+        return await bot.get_quota_usage_async(1)
+
+    assert asyncio.run(scenario()) == 3
+    assert bot.get_quota_usage(1) == 0
+    asyncio.run(bot.flush_quota())
+    assert bot.get_quota_usage(1) == 3
+    with sqlite3.connect(tmp_path / "bot.db") as db:
+        assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_url_cache_roundtrip_and_expiry(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    bot.init_db()
+    url = "https://www.tiktok.com/@user/video/123"
+
+    assert bot.get_cached_video(url) is None
+    bot.cache_video(url, "file-id", "*recipe*")
+    assert bot.get_cached_video(url) == ("file-id", "*recipe*")
+
+    now = bot.time.time()
+    monkeypatch.setattr(bot.time, "time", lambda: now + bot.URL_CACHE_TTL + 1)
+    assert bot.get_cached_video(url) is None
+
+
+def test_connect_applies_per_connection_pragmas(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    db = bot._connect()
+    try:
+        assert db.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+        assert db.execute("PRAGMA cache_size").fetchone()[0] == -20000
+        assert db.execute("PRAGMA synchronous").fetchone()[0] == 1
+        assert db.execute("PRAGMA wal_autocheckpoint").fetchone()[0] == 2000
+    finally:
+        db.close()
+
+
+def test_queries_share_one_connection(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    bot.init_db()
+    opened = []
+    original = bot._connect
+    monkeypatch.setattr(bot, "_connect", lambda: opened.append(1) or original())
+
+    bot.add_quota_usage({7: 1})
+    bot.add_quota_usage({7: 1})
+    assert bot.get_quota_usage(7) == 2
+    assert bot.get_cached_video("https://youtu.be/x") is None
+    assert opened == []
+
+    bot.close_db()
+    assert bot.get_quota_usage(7) == 2
+    assert opened == [1]
+    bot.close_db()
+
+
+def test_quota_counters_survive_restart(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    bot.init_db()
+    bot.add_quota_usage({5: 4})
+    bot.init_db()
+
+    async def scenario():
+        assert await bot.get_quota_usage_async(5) == 4
+        assert await bot.increment_quota_async(5) == 5
+        await bot.flush_quota()
+
+    asyncio.run(scenario())
+    assert bot.get_quota_usage(5) == 5
+    bot.close_db()
+
+
+def test_quota_cache_is_bounded_and_keeps_pending(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(bot._quota_mem, "maxsize", 2)
+    bot.init_db()
+
+    async def scenario():
+        for uid in (1, 2, 3):
+            await bot.increment_quota_async(uid)
+        assert list(bot._quota_mem) == [2, 3]
+        # uid 1 was evicted before its increment reached the database.
+        return await bot.get_quota_usage_async(1)
+
+    assert asyncio.run(scenario()) == 1
+    bot.close_db()
+
+
+def test_recipe_cache_expires_and_prunes(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    bot.init_db()
+    bot.cache_recipe("old", "Рецепт")
+    assert bot.get_cached_recipe("old") == "Рецепт"
+
+    now = bot.time.time()
+    monkeypatch.setattr(bot.time, "time", lambda: now + bot.RECIPE_CACHE_TTL + 1)
+    assert bot.get_cached_recipe("old") is None
+    bot.cache_recipe("new", "Рецепт")
+    rows = bot._get_db().execute("SELECT key FROM recipe_cache").fetchall()
+    assert rows == [("new",)]
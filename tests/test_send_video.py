@@ -0,0 +1,62 @@
+import sys
+import os
+import types
+import tempfile
+import threading
+from pathlib import Path
+
+# Ensure project root is on sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+# Stub external dependencies used in bot.py so that it can be imported
+for name in [
+    "aiohttp", "aiohttp.web",
+    "dotenv", "dotenv.main",
+    "yt_dlp", "yt_dlp.utils",
+    "openai",
+    "telegram", "telegram.ext",
+]:
+    if name not in sys.modules:
+        sys.modules[name] = types.ModuleType(name)
+
+# Provide minimal stubs for submodules/classes used during import
+sys.modules["aiohttp.web"].Application = object
+sys.modules["yt_dlp"].YoutubeDL = object
+sys.modules["yt_dlp.utils"].DownloadError = Exception
+sys.modules["openai"].OpenAI = object
+sys.modules["telegram"].Update = object
+sys.modules["telegram"].InputFile = object
+sys.modules["telegram"].constants = types.SimpleNamespace(ParseMode=None)
+
+dotenv_mod = sys.modules.get("dotenv")
+setattr(dotenv_mod, "load_dotenv", lambda *args, **kwargs: None)
+
+telegram_ext = sys.modules.get("telegram.ext")
+setattr(telegram_ext, "Application", object)
+setattr(telegram_ext, "ContextTypes", object)
+setattr(telegram_ext, "CommandHandler", object)
+setattr(telegram_ext, "MessageHandler", object)
+setattr(telegram_ext, "filters", object)
+
+# Set required environment variables for importing bot
+os.environ.setdefault("TELEGRAM_TOKEN", "test")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import bot
+import asyncio
+
+
+def test_send_video_passes_path_to_local_bot_api(monkeypatch, tmp_path):
+    video = tmp_path / "v.mp4"
+    video.write_bytes(b"data")
+    sent = {}
+
+    async def reply_video(video, **kwargs):
+        sent['video'] = video
+        return types.SimpleNamespace(video=types.SimpleNamespace(file_id="fid"))
+
+    monkeypatch.setattr(bot, "TELEGRAM_API_BASE_URL", "http://localhost:8081")
+    update = types.SimpleNamespace(message=types.SimpleNamespace(reply_video=reply_video))
+
+    assert asyncio.run(bot.send_video(update, video)) == "fid"
+    assert sent['video'] == video
@@ -26,6 +26,7 @@ class DummyParseMode:
     MARKDOWN_V2 = "MarkdownV2"
 
 sys.modules["telegram"].Update = object
+sys.modules["telegram"].InputFile = object
 sys.modules["telegram"].constants = types.SimpleNamespace(ParseMode=DummyParseMode)
 
 dotenv_mod = sys.modules.get("dotenv")
@@ -2,6 +2,7 @@ import sys
 import os
 import types
 import tempfile
+import threading
 from pathlib import Path
 
 # Ensure project root is on sys.path
@@ -24,6 +25,7 @@ sys.modules["yt_dlp"].YoutubeDL = object
 sys.modules["yt_dlp.utils"].DownloadError = Exception
 sys.modules["openai"].OpenAI = object
 sys.modules["telegram"].Update = object
+sys.modules["telegram"].InputFile = object
 sys.modules["telegram"].constants = types.SimpleNamespace(ParseMode=None)
 
 dotenv_mod = sys.modules.get("dotenv")
@@ -47,7 +49,7 @@ import pytest
 def test_sync_download_cleans_temp_dir_on_failure(monkeypatch, tmp_path):
     created = []
 
-    def fake_mkdtemp():
+    def fake_mkdtemp(**kwargs):
         d = tmp_path / f"temp_{len(created)}"
         d.mkdir()
         created.append(d)
@@ -57,15 +59,14 @@ def test_sync_download_cleans_temp_dir_on_failure(monkeypatch, tmp_path):
 
     class DummyDL:
         def __init__(self, opts):
+            self.params = dict(opts)
+        def close(self):
             pass
-        def __enter__(self):
-            return self
-        def __exit__(self, exc_type, exc, tb):
-            return False
         def extract_info(self, url, download=False):
-            raise bot.DownloadError("fail")
+            raise sys.modules["yt_dlp.utils"].DownloadError("fail")
 
     monkeypatch.setattr(bot, "YoutubeDL", DummyDL)
+    monkeypatch.setattr(bot, "_ydl_cache", threading.local())
 
     path, info, err = bot._sync_download("http://example.com")
     assert path is None and info is None
@@ -73,3 +74,163 @@ def test_sync_download_cleans_temp_dir_on_failure(monkeypatch, tmp_path):
 
     for d in created:
         assert not Path(d).exists()
+
+
+def test_sync_download_rejects_long_video_before_download(monkeypatch, tmp_path):
+    monkeypatch.setattr(bot.tempfile, "mkdtemp", lambda **kwargs: str(tmp_path / "dl"))
+    (tmp_path / "dl").mkdir()
+    monkeypatch.setattr(bot, "MAX_DURATION", 60)
+    downloaded = []
+
+    class DummyDL:
+        def __init__(self, opts):
+            self.params = dict(opts)
+        def extract_info(self, url, download=False):
+            assert not download
+            return {"id": "vid", "ext": "mp4", "duration": 600}
+        def process_ie_result(self, info, download=True):
+            downloaded.append(info)
+            return info
+
+    monkeypatch.setattr(bot, "YoutubeDL", DummyDL)
+    monkeypatch.setattr(bot, "_ydl_cache", threading.local())
+
+    probed = []
+    path, info, err = bot._sync_download("http://example.com", on_info=probed.append)
+    assert path is None and info is None
+    assert "600" in err
+    assert not downloaded
+    assert not probed
+    assert not (tmp_path / "dl").exists()
+
+
+def test_sync_download_stream_skips_progressive_mp4(monkeypatch, tmp_path):
+    monkeypatch.setattr(bot.tempfile, "mkdtemp", lambda **kwargs: str(tmp_path / "dl"))
+    (tmp_path / "dl").mkdir()
+
+    class DummyDL:
+        cookiejar = types.SimpleNamespace(get_cookie_header=lambda url: "sid=1")
+
+        def __init__(self, opts):
+            self.params = dict(opts)
+        def extract_info(self, url, download=False):
+            return {"id": "vid", "ext": "mp4", "protocol": "https", "filesize": 1024,
+                    "url": "https://cdn.example.com/v.mp4",
+                    "http_headers": {"User-Agent": "UA"}}
+        def process_ie_result(self, info, download=True):
+            raise AssertionError("streamed videos are not downloaded")
+
+    monkeypatch.setattr(bot, "YoutubeDL", DummyDL)
+    monkeypatch.setattr(bot, "_ydl_cache", threading.local())
+
+    probed = []
+    path, info, err = bot._sync_download("http://example.com", stream=True, on_info=probed.append)
+    assert path is None and err is None
+    assert probed == [info]
+    assert info["http_headers"] == {"User-Agent": "UA", "Cookie": "sid=1"}
+    assert not (tmp_path / "dl").exists()
+
+
+def test_sweep_tmp_dir_removes_only_bot_dirs(monkeypatch, tmp_path):
+    (tmp_path / f"{bot.TMP_PREFIX}old").mkdir()
+    (tmp_path / "other").mkdir()
+    monkeypatch.setattr(bot, "TMP_DIR", str(tmp_path))
+
+    bot.sweep_tmp_dir()
+
+    assert [p.name for p in tmp_path.iterdir()] == ["other"]
+
+
+def test_sync_download_rejects_oversize_video_before_download(monkeypatch, tmp_path):
+    monkeypatch.setattr(bot.tempfile, "mkdtemp", lambda **kwargs: str(tmp_path / "dl"))
+    (tmp_path / "dl").mkdir()
+    monkeypatch.setattr(bot, "MAX_FILESIZE", 50 * 1024 * 1024)
+
+    class DummyDL:
+        def __init__(self, opts):
+            self.params = dict(opts)
+        def extract_info(self, url, download=False):
+            return {"id": "vid", "ext": "mp4", "duration": 30, "filesize_approx": 80 * 1024 * 1024}
+        def process_ie_result(self, info, download=True):
+            raise AssertionError("oversize videos are not downloaded")
+
+    monkeypatch.setattr(bot, "YoutubeDL", DummyDL)
+    monkeypatch.setattr(bot, "_ydl_cache", threading.local())
+
+    path, info, err = bot._sync_download("http://example.com")
+    assert path is None and info is None
+    assert "80" in err
+    assert not (tmp_path / "dl").exists()
+
+
+def test_sync_download_uses_requested_downloads_filepath(monkeypatch, tmp_path):
+    monkeypatch.setattr(bot.tempfile, "mkdtemp", lambda **kwargs: str(tmp_path / "dl"))
+    (tmp_path / "dl").mkdir()
+    merged = tmp_path / "dl" / "vid.mkv"
+
+    class DummyDL:
+        def __init__(self, opts):
+            self.params = dict(opts)
+        def extract_info(self, url, download=False):
+            return {"id": "vid", "ext": "mp4"}
+        def process_ie_result(self, info, download=True):
+            merged.write_text("video")
+            return dict(info, requested_downloads=[{"filepath": str(merged)}])
+        def prepare_filename(self, info):
+            raise AssertionError("the recorded filepath is used")
+
+    monkeypatch.setattr(bot, "YoutubeDL", DummyDL)
+    monkeypatch.setattr(bot, "_ydl_cache", threading.local())
+
+    path, info, err = bot._sync_download("http://example.com")
+    assert err is None
+    assert path == merged and path.exists()
+
+
+@pytest.mark.parametrize("size,ratelimit", [(None, 0), (1024, 1_000_000)])
+def test_sync_download_does_not_stream_past_yt_dlp_limits(monkeypatch, tmp_path, size, ratelimit):
+    monkeypatch.setattr(bot.tempfile, "mkdtemp", lambda **kwargs: str(tmp_path / "dl"))
+    (tmp_path / "dl").mkdir()
+    monkeypatch.setattr(bot, "MAX_FILESIZE", 50 * 1024 * 1024)
+    monkeypatch.setattr(bot, "YDL_RATELIMIT", ratelimit)
+    downloaded = []
+
+    class DummyDL:
+        def __init__(self, opts):
+            self.params = dict(opts)
+        def extract_info(self, url, download=False):
+            return {"id": "vid", "ext": "mp4", "protocol": "https", "filesize": size,
+                    "url": "https://cdn.example.com/v.mp4"}
+        def process_ie_result(self, info, download=True):
+            downloaded.append(info)
+            raise sys.modules["yt_dlp.utils"].DownloadError("stop")
+
+    monkeypatch.setattr(bot, "YoutubeDL", DummyDL)
+    monkeypatch.setattr(bot, "_ydl_cache", threading.local())
+
+    bot._sync_download("http://example.com", stream=True)
+    assert len(downloaded) == 1
+
+
+def test_sync_download_applies_ratelimit_unless_unthrottled(monkeypatch, tmp_path):
+    monkeypatch.setattr(bot.tempfile, "mkdtemp", lambda **kwargs: str(tmp_path / "dl"))
+    monkeypatch.setattr(bot, "YDL_RATELIMIT", 1_000_000)
+    seen = []
+
+    class DummyDL:
+        def __init__(self, opts):
+            self.params = dict(opts)
+        def extract_info(self, url, download=False):
+            return {"id": "vid", "ext": "mp4"}
+        def process_ie_result(self, info, download=True):
+            seen.append(self.params["ratelimit"])
+            raise sys.modules["yt_dlp.utils"].DownloadError("stop")
+
+    monkeypatch.setattr(bot, "YoutubeDL", DummyDL)
+    monkeypatch.setattr(bot, "_ydl_cache", threading.local())
+
+    for throttle in (True, False):
+        (tmp_path / "dl").mkdir()
+        bot._sync_download("http://example.com", throttle=throttle)
+
+    assert seen == [1_000_000, None]
@@ -0,0 +1,172 @@
+import sys
+import os
+import types
+import tempfile
+from pathlib import Path
+
+# Ensure project root is on sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+# Stub external dependencies used in bot.py so that it can be imported
+for name in [
+    "aiohttp", "aiohttp.web",
+    "dotenv", "dotenv.main",
+    "yt_dlp", "yt_dlp.utils",
+    "openai",
+    "telegram", "telegram.ext",
+]:
+    if name not in sys.modules:
+        sys.modules[name] = types.ModuleType(name)
+
+# Provide minimal stubs for submodules/classes used during import
+sys.modules["aiohttp.web"].Application = object
+sys.modules["yt_dlp"].YoutubeDL = object
+sys.modules["yt_dlp.utils"].DownloadError = Exception
+sys.modules["openai"].OpenAI = object
+sys.modules["telegram"].Update = object
+sys.modules["telegram"].InputFile = object
+sys.modules["telegram"].constants = types.SimpleNamespace(ParseMode=None)
+
+dotenv_mod = sys.modules.get("dotenv")
+setattr(dotenv_mod, "load_dotenv", lambda *args, **kwargs: None)
+
+telegram_ext = sys.modules.get("telegram.ext")
+setattr(telegram_ext, "Application", object)
+setattr(telegram_ext, "ContextTypes", object)
+setattr(telegram_ext, "CommandHandler", object)
+setattr(telegram_ext, "MessageHandler", object)
+setattr(telegram_ext, "filters", object)
+
+# Set required environment variables for importing bot
+os.environ.setdefault("TELEGRAM_TOKEN", "test")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import bot
+import asyncio
+import pytest
+
+
+def test_local_transcriber_runs_jobs_in_order(monkeypatch):
+    transcriber = bot.LocalTranscriber()
+    order = []
+
+    class FakePipeline:
+        def transcribe(self, source, batch_size):
+            name = Path(source).name
+            order.append(name)
+            if name == "bad":
+                raise RuntimeError("decode failed")
+            return [types.SimpleNamespace(text=f" {name} ")], None
+
+    transcriber._pipeline = FakePipeline()
+
+    async def scenario():
+        return await asyncio.gather(
+            transcriber.submit(Path("one")),
+            transcriber.submit(Path("bad")),
+            transcriber.submit(Path("two")),
+            return_exceptions=True,
+        )
+
+    one, bad, two = asyncio.run(scenario())
+    assert (one, two) == ("one", "two")
+    assert isinstance(bad, RuntimeError)
+    assert order == ["one", "bad", "two"]
+
+
+def test_local_transcriber_passes_raw_pcm_as_float_samples():
+    np = pytest.importorskip("numpy")
+    transcriber = bot.LocalTranscriber()
+    seen = []
+
+    class FakePipeline:
+        def transcribe(self, source, batch_size):
+            seen.append(source)
+            return [types.SimpleNamespace(text="ok")], None
+
+    transcriber._pipeline = FakePipeline()
+    pcm = np.array([0, 16384, -32768], dtype=np.int16).tobytes()
+    assert transcriber._transcribe(pcm) == "ok"
+    assert seen[0].dtype == np.float32
+    assert list(seen[0]) == [0.0, 0.5, -1.0]
+
+
+def test_whisper_model_is_quantized_per_device(monkeypatch):
+    fake = types.SimpleNamespace(get_cuda_device_count=lambda: 1)
+    monkeypatch.setitem(sys.modules, "ctranslate2", fake)
+    assert bot._whisper_model_kwargs() == {"device": "cuda", "compute_type": "int8_float16"}
+
+    fake.get_cuda_device_count = lambda: 0
+    assert bot._whisper_model_kwargs()["compute_type"] == "int8"
+
+    monkeypatch.setattr(bot, "WHISPER_COMPUTE_TYPE", "float16")
+    assert bot._whisper_model_kwargs()["compute_type"] == "float16"
+
+
+def test_openai_client_is_shared_and_closed(monkeypatch):
+    created = []
+
+    class FakeClient:
+        def __init__(self, api_key, **kwargs):
+            self.closed = False
+            created.append(self)
+
+        async def close(self):
+            self.closed = True
+
+    monkeypatch.setattr(sys.modules["openai"], "AsyncOpenAI", FakeClient, raising=False)
+    monkeypatch.setattr(bot, "_openai_client", None)
+    assert bot._get_openai_client() is bot._get_openai_client()
+    asyncio.run(bot.close_openai_client())
+    assert len(created) == 1 and created[0].closed
+    assert bot._openai_client is None
+
+
+def test_recipe_extraction_skips_short_non_food_text(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    bot.init_db()
+
+    def fail():
+        raise AssertionError("the model must not be called")
+
+    monkeypatch.setattr(bot, "_get_openai_client", fail)
+    assert asyncio.run(bot.extract_recipe_from_video_text("#fun #viral\n")) == ""
+
+    calls = []
+
+    class Completions:
+        async def create(self, **kwargs):
+            calls.append(kwargs)
+            message = types.SimpleNamespace(content=" Рецепт ")
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=Completions()))
+    monkeypatch.setattr(bot, "_get_openai_client", lambda: client)
+    assert asyncio.run(bot.extract_recipe_from_video_text("Паста\nмука 200 гр. и яйца")) == "Рецепт"
+    assert len(calls) == 1
+
+
+def test_recipe_extraction_is_cached_by_input(monkeypatch, tmp_path):
+    monkeypatch.chdir(tmp_path)
+    bot.init_db()
+    calls = []
+
+    class Completions:
+        async def create(self, **kwargs):
+            calls.append(kwargs)
+            message = types.SimpleNamespace(content=f"Рецепт {len(calls)}")
+            return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message)])
+
+    client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=Completions()))
+    monkeypatch.setattr(bot, "_get_openai_client", lambda: client)
+
+    text = "Блины\nмука 200 гр. и молоко"
+    assert asyncio.run(bot.extract_recipe_from_video_text(text)) == "Рецепт 1"
+    bot.init_db()
+    assert asyncio.run(bot.extract_recipe_from_video_text(text)) == "Рецепт 1"
+    assert asyncio.run(bot.extract_recipe_from_video_text(text + "!")) == "Рецепт 2"
+    assert len(calls) == 2
+
+    old_key = bot._recipe_key(text)
+    monkeypatch.setattr(bot, "RECIPE_PROMPT_VERSION", "v2")
+    assert bot._recipe_key(text) != old_key
@@ -0,0 +1,85 @@
+import sys
+import os
+import types
+import tempfile
+import threading
+from pathlib import Path
+
+# Ensure project root is on sys.path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+# Stub external dependencies used in bot.py so that it can be imported
+for name in [
+    "aiohttp", "aiohttp.web",
+    "dotenv", "dotenv.main",
+    "yt_dlp", "yt_dlp.utils",
+    "openai",
+    "telegram", "telegram.ext",
+]:
+    if name not in sys.modules:
+        sys.modules[name] = types.ModuleType(name)
+
+# Provide minimal stubs for submodules/classes used during import
+sys.modules["aiohttp.web"].Application = object
+sys.modules["yt_dlp"].YoutubeDL = object
+sys.modules["yt_dlp.utils"].DownloadError = Exception
+sys.modules["openai"].OpenAI = object
+sys.modules["telegram"].Update = object
+sys.modules["telegram"].InputFile = object
+sys.modules["telegram"].constants = types.SimpleNamespace(ParseMode=None)
+
+dotenv_mod = sys.modules.get("dotenv")
+setattr(dotenv_mod, "load_dotenv", lambda *args, **kwargs: None)
+
+telegram_ext = sys.modules.get("telegram.ext")
+setattr(telegram_ext, "Application", object)
+setattr(telegram_ext, "ContextTypes", object)
+setattr(telegram_ext, "CommandHandler", object)
+setattr(telegram_ext, "MessageHandler", object)
+setattr(telegram_ext, "filters", object)
+
+# Set required environment variables for importing bot
+os.environ.setdefault("TELEGRAM_TOKEN", "test")
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+import bot
+import asyncio
+
+
+def test_webhook_queues_update_and_answers_immediately(monkeypatch):
+    routes = {}
+
+    class FakeRouter:
+        def add_get(self, path, handler):
+            routes[("GET", path)] = handler
+
+        def add_post(self, path, handler):
+            routes[("POST", path)] = handler
+
+    fake_web = types.SimpleNamespace(
+        Application=lambda: types.SimpleNamespace(router=FakeRouter()),
+        Response=lambda text: text,
+    )
+    monkeypatch.setattr(bot, "web", fake_web)
+    monkeypatch.setattr(
+        bot, "Update", types.SimpleNamespace(de_json=lambda data, b: ("update", data)), raising=False
+    )
+
+    async def scenario():
+        app = types.SimpleNamespace(bot="bot", update_queue=asyncio.Queue())
+
+        async def process_update(update):
+            raise AssertionError("updates are processed by the application, not the handler")
+
+        app.process_update = process_update
+        bot.create_web_app(app)
+
+        async def json():
+            return {"update_id": 1}
+
+        response = await routes[("POST", "/")](types.SimpleNamespace(json=json))
+        return response, app.update_queue.get_nowait()
+
+    response, queued = asyncio.run(scenario())
+    assert response == "OK"
+    assert queued == ("update", {"update_id": 1})